@@ -1,15 +1,59 @@
 # -*- coding: utf-8 -*-
-import sys,os,string,time,wave,datetime,shutil,fnmatch,glob,xml.etree.ElementTree as ET
+import sys,os,string,time,wave,datetime,shutil,fnmatch,glob,struct,csv,threading,xml.etree.ElementTree as ET
+from multiprocessing.pool import ThreadPool
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+#===============================================================================================
+# metadata fields read from the XML file of a recording (written by makeBatScopeXml.py)
+metadataFields = ("BatRecDeviceName", "BatRecDate", "BatRecSpeed", "BatRecLocationDevice", "BatRecGPSValid", "BatRecGPSLat", "BatRecGPSLong", "BatRecGPSAltitude", "BatRecGPSHDOP", "BatRecGPSSatsUsed", "BatRecTemperature", "BatRecDeviceID", "BatRecDeviceFirmware", "BatRecTriggerCutOffFreqEff", "BatRecPreTriggerTime", "BatRecPostTriggerTime")
+# session index written by makeBatScopeXml.py into the BatScope directory, one row with the metadata fields per recording
+sessionIndexName = "batscope-index.csv"
+# number of threads reading wav headers and XML files, reading is mostly waiting for the disk
+metadataThreads = 8
+# recordings on the same file system as the BatScope database are hard linked instead of copied, saves time and space
+# but the recording in the database and in the dump are the same file: changing one of them in place (editing in
+# BatScope, trimming or dumping the card again into the same directory) changes the other one as well
+linkAudioFiles = False
+# number of recordings read ahead into the disk cache while BatScope processes the current one
+prefetchFiles = 8
+# block size for copying and reading ahead
+copyBlockSize = 1024 * 1024
+# cut silent parts of the recordings before they are imported, needs numpy - see trimAudioFile()
+# a silent part is cut if it is longer than two margins, one margin is kept on each side of the calls
+trimSilence = False
+trimThresholdDb = 12
+trimMarginMs = 250
+trimBlockMs = 1
+#===============================================================================================
+# numpy is optional and only imported when it is needed
+numpy = None
+numpyLoaded = False
+def loadNumpy():
+	global numpy, numpyLoaded
+	if not numpyLoaded:
+		try:
+			import numpy
+		except ImportError:
+			numpy = None
+		numpyLoaded = True
+	return numpy
 #===============================================================================================
 class ConverterModule(object):
 	#-------------------------
 	def __init__(self, log):
 		self.log = log
+		self.waveFiles = list()
+		self.waveFilePositions = dict()
+		self.prefetchQueue = None
+		self.prefetchThread = None
+		self.prefetched = set()
 	#-------------------------
 	def info(self, item=None):
 		infodict = dict()
 		infodict['Name']="Bat-Pi v1 Importer"
-		infodict['Version']="1.0"
+		infodict['Version']="1.1"
 		infodict['Author']="RBO, adaptation for the Bat-Pi by FVG"
 		infodict['Mail']="batscope@wsl.ch"
 		infodict['Web']="www.wsl.ch"
@@ -26,72 +70,278 @@ class ConverterModule(object):
 		return "*.wav"
 	#-------------------------
 	def metaDataList(self, sdcardPath):
-		
-                dictlist = list()
-                
-                metadataPath = sdcardPath + "/BatScope/"
-                waveFiles = self.getAllFilesByExtension(sdcardPath, "wav")
-                
-                                                                       
-		for wavFilePath in waveFiles:
-
-                        (wfp,wavFile) = os.path.split(wavFilePath)
-                        (fileName,fileExtension) = os.path.splitext(wavFile)
-
-       			d = dict()
-       			
-        		d["FileName"] = wavFile
-			d["BatRecBitsPerSample"] = 16
-			d["BatRecChannel"] = 1
+		# reads the metadata of all recordings, files are read by several threads
+		# the order of the list is the order of the wav files
+		metadataPath = sdcardPath + "/BatScope/"
+		waveFiles = list(self.getAllFilesByExtension(sdcardPath, "wav"))
+		# BatScope converts the recordings in this order, audioConvert reads ahead along this list
+		self.waveFiles = waveFiles
+		self.waveFilePositions = dict((os.path.abspath(wavFilePath), position) for position, wavFilePath in enumerate(waveFiles))
+		sessionIndex = self.readSessionIndex(metadataPath + sessionIndexName)
+		pool = ThreadPool(metadataThreads)
+		try:
+			dictlist = pool.map(lambda wavFilePath: self.recordingMetaData(wavFilePath, metadataPath, sessionIndex), waveFiles)
+		finally:
+			pool.close()
+			pool.join()
+		return dictlist
+	#-------------------------
+	def readSessionIndex(self, indexFile):
+		# reads the session index into a dict with the wav file name as key and a dict of the metadata fields as value
+		# returns an empty dict if there is no index or it lacks a field, metadata is then read from the XML files
+		sessionIndex = dict()
+		try:
+			f = open(indexFile)
+			try:
+				rows = csv.reader(f, delimiter=';')
+				header = next(rows)
+				for field in ("FileName",) + metadataFields:
+					if field not in header:
+						return sessionIndex
+				for row in rows:
+					if len(row) == len(header):
+						record = dict(zip(header, row))
+						sessionIndex[record["FileName"]] = record
+			finally:
+				f.close()
+		except:
+			sessionIndex = dict()
+		return sessionIndex
+	#-------------------------
+	def recordingMetaData(self, wavFilePath, metadataPath, sessionIndex):
+		(wfp,wavFile) = os.path.split(wavFilePath)
+		(fileName,fileExtension) = os.path.splitext(wavFile)
 
-			wr = wave.open(wavFilePath)
-			d["BatRecSampleRate"] = wr.getframerate()
-			wr.close()
+		d = dict()
+		d["FileName"] = wavFile
+		d["BatRecBitsPerSample"] = 16
+		d["BatRecChannel"] = 1
+		d["BatRecSampleRate"] = self.wavSampleRate(wavFilePath)
 
-                        try:
+		record = sessionIndex.get(wavFile)
+		if record is not None:
+			for field in metadataFields:
+				d[field] = record[field]
+			return d
 
-                                xmlFile = metadataPath + fileName + '.xml'
-                                tree = ET.parse(xmlFile)
-                                root = tree.getroot()
-                                
-                                d["BatRecDeviceName"] = root.find('BatRecDeviceName').text
-                                d["BatRecDate"] = root.find('BatRecDate').text
-                                d["BatRecSpeed"] = root.find('BatRecSpeed').text
-        			d["BatRecLocationDevice"] = root.find('BatRecLocationDevice').text
-                                d["BatRecGPSValid"] = root.find('BatRecGPSValid').text
-                                d["BatRecGPSLat"] = root.find('BatRecGPSLat').text
-                                d["BatRecGPSLong"] = root.find('BatRecGPSLong').text
-                                d["BatRecGPSAltitude"] = root.find('BatRecGPSAltitude').text
-                                d["BatRecGPSHDOP"] = root.find('BatRecGPSHDOP').text
-                                d["BatRecGPSSatsUsed"] = root.find('BatRecGPSSatsUsed').text
-                                d["BatRecTemperature"] = root.find('BatRecTemperature').text
-                                d["BatRecDeviceID"] = root.find('BatRecDeviceID').text
-                                d["BatRecDeviceFirmware"]  = root.find('BatRecDeviceFirmware').text
-        			d["BatRecTriggerCutOffFreqEff"]  = root.find('BatRecTriggerCutOffFreqEff').text
-        			d["BatRecPreTriggerTime"]  = root.find('BatRecPreTriggerTime').text
-        			d["BatRecPostTriggerTime"]  = root.find('BatRecPostTriggerTime').text        			
-                                metadataFound = 1
-                                
-                        except:
-                                metadataFound = 0
-                                		
+		try:
+			# one pass over the elements of the record, all fields must be present
+			xmlFile = metadataPath + fileName + '.xml'
+			root = ET.parse(xmlFile).getroot()
+			for element in root:
+				if element.tag in metadataFields:
+					d[element.tag] = element.text
+			metadataFound = 1
+			for field in metadataFields:
+				if field not in d:
+					metadataFound = 0
+		except:
+			metadataFound = 0
 
-			if metadataFound == 0:
-				dt = datetime.datetime.fromtimestamp(os.path.getmtime(wavFilePath))
-				d["BatRecDate"] = dt.strftime("%Y%m%d%H%M%S")
+		if metadataFound == 0:
+			dt = datetime.datetime.fromtimestamp(os.path.getmtime(wavFilePath))
+			d["BatRecDate"] = dt.strftime("%Y%m%d%H%M%S")
 
-			dictlist.append(d)
-			
-		return dictlist
+		return d
+	#-------------------------
+	def wavSampleRate(self, wavFilePath):
+		# reads the sample rate from the RIFF header, without opening the audio data
+		# unusual files are left to the wave module
+		header = self.readWavHeader(wavFilePath)
+		if header is not None:
+			return header["sampleRate"]
+		wr = wave.open(wavFilePath)
+		sampleRate = wr.getframerate()
+		wr.close()
+		return sampleRate
+	#-------------------------
+	def readWavHeader(self, wavFilePath):
+		# reads the fmt chunk and finds the data chunk of a wav file, chunks before them (LIST etc.) are skipped
+		# the data size is limited to the bytes present, Bat-Pi recordings cut off by a power loss are shorter than their header says
+		# returns a dict with the header values or None if this is no valid wav file
+		try:
+			f = open(wavFilePath, 'rb')
+			try:
+				fileSize = os.fstat(f.fileno()).st_size
+				riff = f.read(12)
+				if len(riff) < 12 or riff[0:4] != b'RIFF' or riff[8:12] != b'WAVE':
+					return None
+				header = None
+				while True:
+					chunk = f.read(8)
+					if len(chunk) < 8:
+						return None
+					(chunkId, chunkSize) = struct.unpack('<4sI', chunk)
+					if chunkId == b'fmt ':
+						fmt = f.read(chunkSize + (chunkSize & 1))
+						if len(fmt) < 16:
+							return None
+						(audioFormat, channels, sampleRate, byteRate, blockAlign, bitsPerSample) = struct.unpack('<HHIIHH', fmt[0:16])
+						header = dict(audioFormat=audioFormat, channels=channels, sampleRate=sampleRate, blockAlign=blockAlign, bitsPerSample=bitsPerSample)
+					elif chunkId == b'data':
+						if header is None or header["blockAlign"] == 0:
+							return None
+						header["dataOffset"] = f.tell()
+						header["dataSize"] = min(chunkSize, fileSize - header["dataOffset"])
+						return header
+					else:
+						f.seek(chunkSize + (chunkSize & 1), 1)
+			finally:
+				f.close()
+		except (IOError, OSError, struct.error):
+			return None
 	#-------------------------
 	def getAllFilesByExtension(self, ThePath, AnExtension):
 		return filter(os.path.isfile, glob.glob(ThePath + '/*' + AnExtension))
 	#-------------------------
 	def audioConvert(self, inputPath, outputPath):
-		shutil.copy2(inputPath, outputPath)
+		# the next recordings are read into the disk cache in the background, while this one is transferred
+		self.prefetchAfter(inputPath)
+		if trimSilence and self.trimAudioFile(inputPath, outputPath):
+			shutil.copystat(inputPath, outputPath)
+			return
+		if linkAudioFiles and not os.path.exists(outputPath):
+			try:
+				# same file system: a hard link keeps the data and the time stamps without copying anything
+				os.link(inputPath, outputPath)
+				return
+			except (OSError, AttributeError):
+				pass
+		self.copyAudioFile(inputPath, outputPath)
+		shutil.copystat(inputPath, outputPath)
+	#-------------------------
+	def copyAudioFile(self, inputPath, outputPath):
+		# copies the file inside the kernel where Python supports it (copy_file_range, sendfile on Linux)
+		# and in large blocks everywhere else
+		fIn = open(inputPath, 'rb')
+		try:
+			fOut = open(outputPath, 'wb')
+			try:
+				size = os.fstat(fIn.fileno()).st_size
+				copied = 0
+				try:
+					if hasattr(os, 'copy_file_range'):
+						while copied < size:
+							n = os.copy_file_range(fIn.fileno(), fOut.fileno(), size - copied)
+							if n == 0:
+								break
+							copied = copied + n
+					elif hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+						while copied < size:
+							n = os.sendfile(fOut.fileno(), fIn.fileno(), copied, size - copied)
+							if n == 0:
+								break
+							copied = copied + n
+				except OSError:
+					# not supported between these file systems, copy the rest in blocks
+					pass
+				fIn.seek(copied)
+				fOut.seek(copied)
+				shutil.copyfileobj(fIn, fOut, copyBlockSize)
+			finally:
+				fOut.close()
+		finally:
+			fIn.close()
+	#-------------------------
+	def trimAudioFile(self, inputPath, outputPath):
+		# writes the recording without the silent parts before, between and after the calls
+		# parts are silent if the energy of all their blocks stays below the noise floor (the median block energy)
+		# plus trimThresholdDb, trimMarginMs are kept before and after each loud part, so calls are not cut off
+		# returns False and writes nothing if numpy is missing, the file is no 16 bit PCM file or there is nothing to cut
+		numpy = loadNumpy()
+		header = self.readWavHeader(inputPath)
+		if numpy is None or header is None or header["audioFormat"] != 1 or header["bitsPerSample"] != 16:
+			return False
+		channels = header["channels"]
+		frames = header["dataSize"] // header["blockAlign"]
+		blockFrames = max(1, header["sampleRate"] * trimBlockMs // 1000)
+		blocks = frames // blockFrames
+		marginBlocks = int(round(float(trimMarginMs) / trimBlockMs))
+		if blocks <= 2 * marginBlocks:
+			return False    # shorter than the margins, nothing could be cut
+
+		# the samples are mapped into memory, only the pages needed are read and nothing is copied
+		samples = numpy.memmap(inputPath, dtype='<i2', mode='r', offset=header["dataOffset"], shape=(frames * channels,))
+		try:
+			energy = numpy.empty(blocks)
+			step = max(1, 262144 // blockFrames) * blockFrames    # frames per chunk, memory use stays small for long files
+			for first in range(0, blocks * blockFrames, step):
+				last = min(first + step, blocks * blockFrames)
+				chunk = samples[first * channels:last * channels].astype(numpy.float32).reshape(-1, blockFrames * channels)
+				energy[first // blockFrames:last // blockFrames] = (chunk * chunk).mean(axis=1)
+			loud = energy > max(numpy.median(energy), 1.0) * 10 ** (trimThresholdDb / 10.0)
+			if not loud.any():
+				return False
+
+			# keep the margin around loud blocks, the last incomplete block belongs to the last block
+			# the full convolution is longer by a margin on each side, its middle part is aligned with the blocks
+			keep = numpy.convolve(loud.astype(numpy.int32), numpy.ones(2 * marginBlocks + 1, dtype=numpy.int32), 'full')[marginBlocks:marginBlocks + blocks] > 0
+			if keep.all():
+				return False
+			edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([0], keep.astype(numpy.int8), [0]))))
+			parts = list()
+			for (firstBlock, lastBlock) in zip(edges[0::2], edges[1::2]):
+				lastFrame = frames if lastBlock == blocks else min(lastBlock * blockFrames, frames)
+				parts.append((firstBlock * blockFrames * channels, lastFrame * channels))
+
+			# the header gets the size of the samples actually written
+			dataSize = 0
+			for (first, last) in parts:
+				dataSize = dataSize + samples[first:last].size * 2
+			fOut = open(outputPath, 'wb')
+			try:
+				fOut.write(b'RIFF' + struct.pack('<I', 36 + dataSize) + b'WAVE')
+				fOut.write(b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, header["sampleRate"], header["sampleRate"] * header["blockAlign"], header["blockAlign"], 16))
+				fOut.write(b'data' + struct.pack('<I', dataSize))
+				for (first, last) in parts:
+					fOut.write(samples[first:last].tobytes())
+			finally:
+				fOut.close()
+		finally:
+			del samples
+		return True
+	#-------------------------
+	def prefetchAfter(self, inputPath):
+		# queues the recordings following inputPath for the read ahead thread
+		position = self.waveFilePositions.get(os.path.abspath(inputPath))
+		if position is None or prefetchFiles < 1:
+			return
+		if self.prefetchThread is None:
+			self.prefetchQueue = queue.Queue()
+			self.prefetchThread = threading.Thread(target=self.prefetchWorker)
+			self.prefetchThread.daemon = True
+			self.prefetchThread.start()
+		for wavFilePath in self.waveFiles[position + 1:position + 1 + prefetchFiles]:
+			if wavFilePath not in self.prefetched:
+				self.prefetched.add(wavFilePath)
+				self.prefetchQueue.put(wavFilePath)
+	#-------------------------
+	def prefetchWorker(self):
+		# reads queued recordings, so the operating system has them in its disk cache when BatScope asks for them
+		while True:
+			wavFilePath = self.prefetchQueue.get()
+			if wavFilePath is None:
+				break
+			try:
+				f = open(wavFilePath, 'rb')
+				try:
+					if hasattr(os, 'posix_fadvise'):
+						os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+					else:
+						while f.read(copyBlockSize):
+							pass
+				finally:
+					f.close()
+			except (IOError, OSError):
+				pass
 	#-------------------------
 	def cleanUp(self):
-		pass
+		# stops the read ahead thread
+		if self.prefetchThread is not None:
+			self.prefetchQueue.put(None)
+			self.prefetchThread.join()
+			self.prefetchThread = None
+		self.prefetched = set()
 	#-------------------------
 	def userMustEnterSpeed(self):
 		return False
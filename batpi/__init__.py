@@ -0,0 +1,14 @@
+# batpi - scripts for Bat-Pi recordings and SSF BAT3 screenshots as an importable package
+# Organisation: BI Rettet den Wollenberg e.V. see http://bi-wollenberg.org/ (German site)
+# Author      : FVG - ffhmonitor@gmail.com
+# Licence: GNU General Public Licence v3
+
+# Modules:
+# - batPiCommon               shared parsers and writers (ENVLOG.TXT, GPX, wav files, reports)
+# - makeBatNightDirectories   directory structure for each bat night of a site
+# - makeBatScopeXml           georeferencing and BatScope XML metadata files
+# - processSSFBatScreenshots  SSF BAT3 detector screenshots
+# - screenRecordings          screening of recordings for bat calls, sorts out likely noise
+# - processCampaign           all Bat-Pi dumps of a campaign in one run
+# - cli                       the batpi command line, run it with python3 -m batpi
+# Nothing is imported here, so the command line starts fast and only loads what a command needs.
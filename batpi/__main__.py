@@ -0,0 +1,5 @@
+# python3 -m batpi <command> [options] - see cli.py
+
+from .cli import main
+
+main()
@@ -0,0 +1,767 @@
+#!/usr/lib/python3.2
+
+# General description:
+# Shared helper functions for the Bat-Pi scripts in this project (makeBatScopeXml.py, makeBatNightDirectories.py,
+# processSSFBatScreenshots.py)
+# Data files are parsed once into sorted arrays, so lookups for thousands of recordings stay fast
+# Organisation: BI Rettet den Wollenberg e.V. see http://bi-wollenberg.org/ (German site)
+# Author      : FVG - ffhmonitor@gmail.com
+
+# This file is on GitHub: https://github.com/ffhmon/bat-project/batpi/batPiCommon.py
+# Licence: GNU General Public Licence v3
+
+# Script history:
+# Version 1.0 - October 17, 2026 - initial commit, environment log (ENVLOG.TXT) timeline
+#   - streaming GPX reader and time sorted trackpoint index, moved here from makeBatScopeXml.py
+#   - wav directory scanner with optional RIFF header check
+#   - GPX writer for track point extracts
+#   - buffered CSV and KML report writers, reports are replaced atomically when complete
+#   - batch georeferencing of many recordings at once, vectorized with numpy if it is installed
+#   - moved into the batpi package, parseWavFileDateTime and environment log line parsing shared by all scripts
+#   - parsed gpx tracks are cached by file content, devices sharing a gps logger parse its track once
+#   - Bat-Pi device settings reader, moved here from makeBatScopeXml.py, settings are cached on disk by file content
+#   - memory mapped access to the samples of wav files as numpy arrays, without reading or copying whole files
+
+import bisect, calendar, collections, csv, datetime, hashlib, json, os, re, struct, time
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+from array import array
+
+# a single GPX track point - time in UTC epoch seconds
+GpxTrackpoint = collections.namedtuple('GpxTrackpoint', 'time lat long altitude hdop sats')
+
+# GPX time stamps, e.g. 2016-07-09T22:33:20Z, 2016-07-09T22:33:20.000Z or 2016-07-10T00:33:20+02:00
+gpxTimePattern = re.compile(r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.\d*)?(Z|[+-]\d{2}:?\d{2})?$')
+
+# elements that are released as soon as they have been read, so memory use does not grow with the file size
+gpxReleasedTags = ('trkpt', 'rtept', 'wpt', 'trkseg', 'trk', 'rte')
+
+# numpy is optional and slow to import, it is imported by loadNumpy() when batch georeferencing needs it
+numpy = None
+numpyLoaded = False
+
+# how recordings are matched to gps track points, see joinTrackpoints()
+georeferenceModes = ('window', 'nearest', 'interpolate')
+
+# recordings smaller than this are empty or broken (a bare wav header is 44 bytes)
+minimumWavSize = 1000
+
+# numpy sample types of wav files by (audio format, bits per sample), format 1 is PCM and 3 is IEEE float
+# 8 bit PCM samples are unsigned, 24 bit samples have no numpy type and can not be mapped
+wavSampleTypes = {(1, 8): 'u1', (1, 16): '<i2', (1, 32): '<i4', (3, 32): '<f4', (3, 64): '<f8'}
+
+# (offset, full scale) of the sample types, (sample - offset) / full scale is between -1 and 1 for every format
+wavSampleScales = {'u1': (128.0, 128.0), '<i2': (0.0, 32768.0), '<i4': (0.0, 2147483648.0), '<f4': (0.0, 1.0), '<f8': (0.0, 1.0)}
+
+# reports are written through a buffer of this size, so rows are flushed to disk in batches
+reportBufferSize = 1024 * 1024
+
+# trackpoint indexes of readGpxTrackpoints(), keyed by the content hashes of the gpx files
+gpxTrackCache = dict()
+
+# Bat-Pi device settings from out/bin/recordings.sh and etc/batpi/recording.conf, see readBatPiSettings()
+# values are '' if the device does not log them, trigger times in msec, thresholds in % and frequencies in Hz
+BatPiSettings = collections.namedtuple('BatPiSettings', 'deviceName deviceFirmware micVersion preTrigger postTrigger ' \
+    + 'startTreshold stopTreshold startFrequency recordLength volume priority recbuffer')
+
+# version of the settings parser, part of the cache key - increase it when readBatPiSettings() changes
+settingsParserVersion = '1'
+
+# parsed settings files are cached in this directory, one file per content hash, shared by all bat nights and sites
+# the environment variable BATPI_SETTINGS_CACHE sets another directory, an empty value turns the disk cache off,
+# e.g. for scheduled jobs with a read only or shared home directory
+settingsCachePath = os.environ.get('BATPI_SETTINGS_CACHE', \
+    os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'batpi', 'settings'))
+
+# settings already read by this process, keyed like the cache files
+settingsCache = dict()
+
+# entries of scanWavFiles() by file name, keyed by directory and header option, an entry is reused while the size and
+# modification time of its file are the same - the directory modification time does not change if a file is rewritten
+# or still growing
+wavScanCache = dict()
+
+#----------------------------------------------------------------------------------
+def loadNumpy():
+
+    # imports numpy on first use, returns None if it is not installed
+    global numpy, numpyLoaded
+    if not numpyLoaded:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        numpyLoaded = True
+    return numpy
+
+#----------------------------------------------------------------------------------
+def parseWavFileDateTime(wavFileName):
+
+    # takes the recording date time from a Bat-Pi wav file name, e.g. batpi01-N-20160710_003324.wav
+    # returns a dict with the date time elements and the local date time (wavDateTime), 0 if the name can not be parsed
+    returnValue = 0
+    try:
+        theYear = int(wavFileName[10:14])
+        theMonth = int(wavFileName[14:16])
+        theDay = int(wavFileName[16:18])
+        theHour = int(wavFileName[19:21])
+        theMinute = int(wavFileName[21:23])
+        theSecond = int(wavFileName[23:25])
+        theDateTime = datetime.datetime(theYear, theMonth, theDay, theHour, theMinute, theSecond)
+
+        returnValue = dict(wavYear=theYear, wavMonth=theMonth, wavDay=theDay, \
+            wavHour=theHour, wavMinute=theMinute, wavSecond = theSecond, \
+            wavDateTime=theDateTime)
+
+    except:
+        print('Error parsing date time values from wav file name.')
+
+    return returnValue
+
+#----------------------------------------------------------------------------------
+def parseEnvironmentLogLine(tline):
+
+    # parses a line of an environment log (data format: D.M.Y;H:MM;T;H, local time)
+    # returns the local date time of the reading and a list of all fields of the line
+    # raises ValueError for empty or malformed lines
+    fields = tline.split(';')
+    if len(fields) < 2:
+        raise ValueError('Not an environment log line: ' + tline)
+    tempDay, tempMonth, tempYear = fields[0].split('.')
+    tempHour, tempMinute = fields[1].split(':')
+    return datetime.datetime(int(tempYear), int(tempMonth), int(tempDay), int(tempHour), int(tempMinute)), fields
+
+#----------------------------------------------------------------------------------
+def readEnvironmentLog(envLogFile, hourBucket=True):
+
+    # reads an environment log once and returns a time sorted temperature timeline
+    # the log file can be generated by the Bat Pi itselves or by a separate Arduino device using DHT11 or DHT22 sensors
+    # we expect one data line every 10 minutes with temperature T and humidity H values
+    # data format: D.M.Y;H:MM;T;H
+    #
+    # with hourBucket set, the last reading of an hour (minute 50) is stretched to minute 59
+    # and lookups only return readings from the same hour - this is how the scripts always matched temperatures
+    entries = list()
+
+    if os.path.exists(envLogFile):
+        with open(envLogFile) as tempFile:
+            for tline in tempFile:
+                try:
+                    tempDateTime, fields = parseEnvironmentLogLine(tline)
+                    if len(fields) < 3:
+                        raise ValueError('No temperature: ' + tline)
+                    if hourBucket and tempDateTime.minute == 50:
+                        tempDateTime = tempDateTime.replace(minute=59)
+
+                    entries.append((epochSeconds(tempDateTime), float(fields[2])))
+                except ValueError:
+                    # empty or malformed line - skip it
+                    pass
+
+    # a stable sort keeps the file order for readings sharing the same minute
+    entries.sort(key=lambda entry: entry[0])
+
+    envLog = dict(time=array('q'), temperature=array('d'), hourBucket=hourBucket)
+    for entry in entries:
+        envLog['time'].append(entry[0])
+        envLog['temperature'].append(entry[1])
+
+    return envLog
+
+#----------------------------------------------------------------------------------
+def findTemperature(envLog, localDateTime, maxGapSeconds=600):
+
+    # returns the logged temperature for a local date time or None if no reading matches
+    # hour bucket timelines return the first reading at or after the minute of the given time within the same hour
+    # otherwise the nearest reading not farther than maxGapSeconds away is used
+    times = envLog['time']
+
+    if envLog['hourBucket']:
+        minuteSeconds = calendar.timegm((localDateTime.year, localDateTime.month, localDateTime.day, \
+            localDateTime.hour, localDateTime.minute, 0))
+        hourEnd = minuteSeconds - localDateTime.minute * 60 + 3600
+
+        position = bisect.bisect_left(times, minuteSeconds)
+        if position < len(times) and times[position] < hourEnd:
+            return envLog['temperature'][position]
+        return None
+
+    localSeconds = calendar.timegm(localDateTime.timetuple())
+    position = bisect.bisect_left(times, localSeconds)
+
+    nearest = -1
+    for candidate in (position - 1, position):
+        if 0 <= candidate < len(times) and abs(times[candidate] - localSeconds) <= maxGapSeconds:
+            if nearest < 0 or abs(times[candidate] - localSeconds) < abs(times[nearest] - localSeconds):
+                nearest = candidate
+
+    if nearest < 0:
+        return None
+    return envLog['temperature'][nearest]
+
+#----------------------------------------------------------------------------------
+def hashFileContent(fileName):
+
+    # sha1 hex digest of the content of a file, used as cache key for parsed files
+    contentHash = hashlib.sha1()
+    with open(fileName, 'rb') as fContent:
+        for block in iter(lambda: fContent.read(1024 * 1024), b''):
+            contentHash.update(block)
+    return contentHash.hexdigest()
+
+#----------------------------------------------------------------------------------
+def parseGpxTime(timeString):
+
+    # converts a GPX time stamp into UTC epoch seconds, fractions of a second are dropped
+    match = gpxTimePattern.match(timeString.strip())
+    if match is None:
+        raise ValueError('Invalid GPX time stamp: ' + timeString)
+
+    seconds = calendar.timegm(tuple(int(value) for value in match.groups()[0:6]))
+    zone = match.group(7)
+    if zone is not None and zone != 'Z':
+        offset = int(zone[1:3]) * 3600 + int(zone[-2:]) * 60
+        if zone[0] == '+':
+            seconds = seconds - offset
+        else:
+            seconds = seconds + offset
+
+    return seconds
+
+#----------------------------------------------------------------------------------
+def iterGpxTrackpoints(gpxFile):
+
+    # streams all track points of a gpx file as GpxTrackpoint tuples in file order
+    # works with any number of tracks and segments, GPX 1.0, 1.1 or no namespace at all
+    # elements are cleared while reading, so even very large files are read in constant memory
+    # track points without a valid time stamp or position are skipped
+    # a truncated file (e.g. Bat-Pi switched off while logging) yields all points up to the damage
+    stack = list()
+
+    try:
+        for event, element in ET.iterparse(gpxFile, events=('start', 'end')):
+            if event == 'start':
+                stack.append(element)
+                continue
+
+            stack.pop()
+            tag = element.tag.rsplit('}', 1)[-1]
+
+            if tag == 'trkpt':
+                values = dict()
+                for child in element:
+                    values[child.tag.rsplit('}', 1)[-1]] = child.text
+                try:
+                    yield GpxTrackpoint(parseGpxTime(values['time']), \
+                        float(element.get('lat')), float(element.get('lon')), \
+                        float(values.get('ele') or 0), float(values.get('hdop') or 0), int(values.get('sat') or 0))
+                except (KeyError, TypeError, ValueError):
+                    pass
+
+            if tag in gpxReleasedTags:
+                element.clear()
+                if stack:
+                    stack[-1].remove(element)
+
+    except ET.ParseError as error:
+        print('Warning: ' + os.path.basename(gpxFile) + ' is incomplete, reading stopped at ' + str(error))
+
+#----------------------------------------------------------------------------------
+def writeGpxTrackpoints(gpxFile, trackpoints, creator):
+
+    # writes GpxTrackpoint tuples as a single track segment into a GPX 1.1 file
+    # the layout follows the gpxlogger files of the Bat-Pi
+    lines = ['<?xml version="1.0" encoding="utf-8"?>', \
+        '<gpx version="1.1" creator="' + creator + '" xmlns="http://www.topografix.com/GPX/1/1">', \
+        ' <trk>', '  <trkseg>']
+    for point in trackpoints:
+        lines.append('   <trkpt lat="%.6f" lon="%.6f">' % (point.lat, point.long))
+        lines.append('    <ele>%.6f</ele>' % point.altitude)
+        lines.append('    <time>' + time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(point.time)) + '</time>')
+        lines.append('    <sat>%d</sat>' % point.sats)
+        lines.append('    <hdop>%.1f</hdop>' % point.hdop)
+        lines.append('   </trkpt>')
+    lines.extend(['  </trkseg>', ' </trk>', '</gpx>', ''])
+
+    with open(gpxFile, 'w', encoding='utf-8') as fGpx:
+        fGpx.write('\n'.join(lines))
+
+#----------------------------------------------------------------------------------
+def readGpxTrackpoints(gpxFileList):
+
+    # reads the track points of all given gpx files once and builds a time sorted trackpoint index
+    # timestamps are stored as UTC epoch seconds, position and quality values in parallel arrays
+    # so recordings can be located by binary search instead of rescanning the gpx files for every recording
+    # an index is cached by the content of the gpx files, copies of the same track (other devices or bat nights)
+    # are only hashed, not parsed again - the index must not be changed by the caller
+    cacheKey = tuple(hashFileContent(currentGpx) for currentGpx in gpxFileList)
+    if cacheKey in gpxTrackCache:
+        return gpxTrackCache[cacheKey]
+
+    points = list()
+    for currentGpx in gpxFileList:
+        points.extend(iterGpxTrackpoints(currentGpx))
+
+    # a stable sort keeps the gpx file order for track points sharing the same second
+    points.sort(key=lambda point: point.time)
+
+    trackIndex = dict(time=array('q'), lat=array('d'), long=array('d'), \
+        altitude=array('d'), hdop=array('d'), sats=array('i'))
+    for point in points:
+        trackIndex['time'].append(point.time)
+        trackIndex['lat'].append(point.lat)
+        trackIndex['long'].append(point.long)
+        trackIndex['altitude'].append(point.altitude)
+        trackIndex['hdop'].append(point.hdop)
+        trackIndex['sats'].append(point.sats)
+
+    gpxTrackCache[cacheKey] = trackIndex
+    return trackIndex
+
+#----------------------------------------------------------------------------------
+def epochSeconds(utcDateTime):
+
+    # UTC epoch seconds of a naive UTC datetime, the time unit of the trackpoint index
+    return calendar.timegm(utcDateTime.timetuple())
+
+#----------------------------------------------------------------------------------
+def joinTrackpoints(trackIndex, utcTimes, toleranceSeconds=5, mode='window'):
+
+    # georeferences a whole list of UTC times (epoch seconds) in one call, modes:
+    # 'window'      - the first track point less than toleranceSeconds away, see the 'window' branch below
+    # 'nearest'     - the closest track point less than toleranceSeconds away
+    # 'interpolate' - a position on the line between the track points before and after the time if both are
+    #                 less than toleranceSeconds away, with the worse hdop and satellite count of the two,
+    #                 the nearest track point otherwise - for tracks logged every 30 seconds or so
+    # returns a dict of lists in the order of utcTimes: found (True or False), lat, long, altitude, hdop, sats
+    # uses numpy (searchsorted on all times at once) when it is installed, a binary search per time otherwise
+    if mode not in georeferenceModes:
+        raise ValueError('Unknown georeference mode: ' + mode)
+    if loadNumpy() is not None:
+        return joinTrackpointsNumpy(trackIndex, utcTimes, toleranceSeconds, mode)
+
+    times = trackIndex['time']
+    fixes = dict(found=list(), lat=list(), long=list(), altitude=list(), hdop=list(), sats=list())
+
+    for utcSeconds in utcTimes:
+        fix = dict(found=False, lat=0.0, long=0.0, altitude=0.0, hdop=0.0, sats=0)
+
+        if mode == 'window':
+            position = bisect.bisect_right(times, utcSeconds - toleranceSeconds)
+            if position < len(times) and times[position] < utcSeconds + toleranceSeconds:
+                fix = dict(found=True, lat=trackIndex['lat'][position], long=trackIndex['long'][position], \
+                    altitude=trackIndex['altitude'][position], hdop=trackIndex['hdop'][position], sats=trackIndex['sats'][position])
+        else:
+            # the last track point at or before the time and the first one after it
+            after = bisect.bisect_right(times, utcSeconds)
+            before = after - 1
+            beforeValid = before >= 0 and utcSeconds - times[before] < toleranceSeconds
+            afterValid = after < len(times) and times[after] - utcSeconds < toleranceSeconds
+
+            if mode == 'interpolate' and beforeValid and afterValid:
+                fraction = float(utcSeconds - times[before]) / (times[after] - times[before])
+                fix['found'] = True
+                for key in ('lat', 'long', 'altitude'):
+                    fix[key] = trackIndex[key][before] + (trackIndex[key][after] - trackIndex[key][before]) * fraction
+                fix['hdop'] = max(trackIndex['hdop'][before], trackIndex['hdop'][after])
+                fix['sats'] = min(trackIndex['sats'][before], trackIndex['sats'][after])
+            elif beforeValid or afterValid:
+                position = before
+                if not beforeValid or (afterValid and times[after] - utcSeconds < utcSeconds - times[before]):
+                    position = after
+                fix = dict(found=True, lat=trackIndex['lat'][position], long=trackIndex['long'][position], \
+                    altitude=trackIndex['altitude'][position], hdop=trackIndex['hdop'][position], sats=trackIndex['sats'][position])
+
+        for key in fixes:
+            fixes[key].append(fix[key])
+
+    return fixes
+
+#----------------------------------------------------------------------------------
+def joinTrackpointsNumpy(trackIndex, utcTimes, toleranceSeconds, mode):
+
+    # numpy version of joinTrackpoints, the track index arrays are used in place without copying
+    times = numpy.frombuffer(trackIndex['time'], dtype=numpy.int64)
+    queries = numpy.asarray(utcTimes, dtype=numpy.int64)
+    found = numpy.zeros(len(queries), dtype=bool)
+    values = dict(lat=numpy.zeros(len(queries)), long=numpy.zeros(len(queries)), altitude=numpy.zeros(len(queries)), \
+        hdop=numpy.zeros(len(queries)), sats=numpy.zeros(len(queries), dtype=numpy.int64))
+
+    if len(times) > 0 and len(queries) > 0:
+        track = dict(lat=numpy.frombuffer(trackIndex['lat']), long=numpy.frombuffer(trackIndex['long']), \
+            altitude=numpy.frombuffer(trackIndex['altitude']), hdop=numpy.frombuffer(trackIndex['hdop']), \
+            sats=numpy.frombuffer(trackIndex['sats'], dtype=numpy.int32))
+
+        if mode == 'window':
+            position = numpy.searchsorted(times, queries - toleranceSeconds, side='right')
+            found = position < len(times)
+            position = numpy.minimum(position, len(times) - 1)
+            found = found & (times[position] < queries + toleranceSeconds)
+        else:
+            # the last track point at or before each time and the first one after it
+            after = numpy.searchsorted(times, queries, side='right')
+            before = numpy.maximum(after - 1, 0)
+            beforeValid = (after > 0) & (queries - times[before] < toleranceSeconds)
+            after = numpy.minimum(after, len(times) - 1)
+            afterValid = (times[after] > queries) & (times[after] - queries < toleranceSeconds)
+
+            useAfter = ~beforeValid | (afterValid & (times[after] - queries < queries - times[before]))
+            position = numpy.where(useAfter, after, before)
+            found = beforeValid | afterValid
+
+        for key in values:
+            values[key] = numpy.where(found, track[key][position], values[key])
+
+        if mode == 'interpolate':
+            between = beforeValid & afterValid
+            span = numpy.where(between, times[after] - times[before], 1)
+            fraction = (queries - times[before]) / span.astype(numpy.float64)
+            for key in ('lat', 'long', 'altitude'):
+                line = track[key][before] + (track[key][after] - track[key][before]) * fraction
+                values[key] = numpy.where(between, line, values[key])
+            values['hdop'] = numpy.where(between, numpy.maximum(track['hdop'][before], track['hdop'][after]), values['hdop'])
+            values['sats'] = numpy.where(between, numpy.minimum(track['sats'][before], track['sats'][after]), values['sats'])
+
+    fixes = dict((key, values[key].tolist()) for key in values)
+    fixes['found'] = found.tolist()
+    return fixes
+
+#----------------------------------------------------------------------------------
+def readWavHeader(wavFile):
+
+    # reads the RIFF header of a wav file without loading any audio data
+    # walks all chunks up to the data chunk, so extra chunks (LIST etc.) are skipped
+    # a recording cut off by a power loss is flagged as truncated, frames are counted from the data actually present
+    # returns a dict with the header values or None if this is no valid PCM wav file
+    try:
+        with open(wavFile, 'rb') as wav:
+            fileSize = os.fstat(wav.fileno()).st_size
+            riff = wav.read(12)
+            if len(riff) < 12 or riff[0:4] != b'RIFF' or riff[8:12] != b'WAVE':
+                return None
+
+            header = None
+            while True:
+                chunk = wav.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunkId, chunkSize = struct.unpack('<4sI', chunk)
+
+                if chunkId == b'fmt ':
+                    fmt = wav.read(chunkSize + (chunkSize & 1))
+                    if len(fmt) < 16:
+                        return None
+                    audioFormat, channels, sampleRate, byteRate, blockAlign, bitsPerSample = struct.unpack('<HHIIHH', fmt[0:16])
+                    header = dict(audioFormat=audioFormat, channels=channels, sampleRate=sampleRate, \
+                        bitsPerSample=bitsPerSample, blockAlign=blockAlign)
+
+                elif chunkId == b'data':
+                    if header is None or header['blockAlign'] == 0:
+                        return None
+                    dataOffset = wav.tell()
+                    available = fileSize - dataOffset
+                    header['dataOffset'] = dataOffset
+                    header['dataSize'] = min(chunkSize, available)
+                    header['truncated'] = chunkSize > available
+                    header['frames'] = header['dataSize'] // header['blockAlign']
+                    return header
+
+                else:
+                    wav.seek(chunkSize + (chunkSize & 1), os.SEEK_CUR)
+
+    except (IOError, OSError, struct.error):
+        return None
+
+#----------------------------------------------------------------------------------
+def mapWavSamples(wavFile):
+
+    # maps the audio data of a wav file into memory, nothing is read until the samples are used
+    # returns the header dict of readWavHeader with 'samples', a read-only numpy array of shape (frames, channels)
+    # backed by the file - slices of it are views, not copies - and 'sampleOffset' and 'fullScale' of the sample type,
+    # analysis code uses (samples - sampleOffset) / fullScale to treat all formats alike
+    # or None if this is no PCM or float wav file,
+    # the sample format has no numpy type (e.g. 24 bit) or numpy is not installed
+    # extra chunks are skipped and truncated recordings are mapped as far as they go
+    # the file stays mapped until all arrays using it are released
+    if loadNumpy() is None:
+        return None
+    header = readWavHeader(wavFile)
+    if header is None:
+        return None
+    sampleType = wavSampleTypes.get((header['audioFormat'], header['bitsPerSample']))
+    if sampleType is None or header['blockAlign'] != header['channels'] * header['bitsPerSample'] // 8:
+        return None
+
+    header['sampleOffset'], header['fullScale'] = wavSampleScales[sampleType]
+    if header['frames'] == 0:
+        header['samples'] = numpy.zeros((0, header['channels']), dtype=sampleType)
+    else:
+        header['samples'] = numpy.memmap(wavFile, dtype=sampleType, mode='r', offset=header['dataOffset'], \
+            shape=(header['frames'], header['channels']))
+    return header
+
+#----------------------------------------------------------------------------------
+def iterWavChunks(wavMap, chunkFrames):
+
+    # yields (first frame, samples) for consecutive chunks of a mapped wav file (see mapWavSamples)
+    # the samples of a chunk are a view of the file, only the pages of the current chunk are read
+    samples = wavMap['samples']
+    for firstFrame in range(0, len(samples), chunkFrames):
+        yield firstFrame, samples[firstFrame:firstFrame + chunkFrames]
+
+#----------------------------------------------------------------------------------
+def scanWavFiles(directory, readHeaders=False):
+
+    # lists all wav files of a directory with a single directory scan, no file is opened
+    # with readHeaders set, the RIFF header of every recording is read into the 'header' value (see readWavHeader)
+    # the directory is scanned on every call, headers of files with unchanged size and modification time are not read again
+    # returns a list of dicts sorted by file name
+    directory = os.path.abspath(directory)
+    cached = wavScanCache.get((directory, readHeaders), dict())
+
+    wavEntries = list()
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.wav') and entry.is_file():
+            entryStat = entry.stat()
+            wavEntry = cached.get(entry.name)
+            if wavEntry is None or wavEntry['size'] != entryStat.st_size or wavEntry['mtime'] != entryStat.st_mtime:
+                wavEntry = dict(path=entry.path, name=entry.name, size=entryStat.st_size, mtime=entryStat.st_mtime)
+                if readHeaders:
+                    wavEntry['header'] = None
+                    if entryStat.st_size > minimumWavSize:
+                        wavEntry['header'] = readWavHeader(entry.path)
+            wavEntries.append(wavEntry)
+
+    wavEntries.sort(key=lambda wavEntry: wavEntry['name'])
+    wavScanCache[(directory, readHeaders)] = dict((wavEntry['name'], wavEntry) for wavEntry in wavEntries)
+
+    return wavEntries
+
+#----------------------------------------------------------------------------------
+def isInvalidWav(wavEntry):
+
+    # a wav file is invalid if it is too small to hold a recording or (if checked) has no readable audio data
+    if wavEntry['size'] < minimumWavSize:
+        return True
+    return isCheckedWavBroken(wavEntry)
+
+#----------------------------------------------------------------------------------
+def isValidRecording(wavEntry):
+
+    # valid recordings are normal ('-N-') Bat-Pi recordings bigger than minimumWavSize
+    # with a readable header and audio data if the header was checked
+    if wavEntry['size'] <= minimumWavSize or '-N-' not in wavEntry['name']:
+        return False
+    return not isCheckedWavBroken(wavEntry)
+
+#----------------------------------------------------------------------------------
+def isCheckedWavBroken(wavEntry):
+
+    # true if the header of a wav file was read and did not show any audio data
+    if 'header' not in wavEntry:
+        return False
+    header = wavEntry['header']
+    return header is None or header['frames'] == 0
+
+#----------------------------------------------------------------------------------
+def openReport(reportFile):
+
+    # opens a report for writing, see openCsvReport and openKmlReport
+    # everything is written into a temporary file, closeReport renames it to the report file,
+    # so a report is never half written, even if a script is stopped
+    report = dict(path=reportFile, footer='')
+    report['file'] = open(reportFile + '.tmp', 'w', encoding='utf-8', newline='', buffering=reportBufferSize)
+    return report
+
+#----------------------------------------------------------------------------------
+def openCsvReport(csvFile, header):
+
+    # opens a semicolon separated report and writes the header, a list of column names
+    # values containing a semicolon, a quote or a line break are quoted by the csv module
+    report = openReport(csvFile)
+    report['writer'] = csv.writer(report['file'], delimiter=';', lineterminator='\n')
+    report['writer'].writerow(header)
+    return report
+
+#----------------------------------------------------------------------------------
+def writeCsvRow(report, row):
+
+    # writes a list of values as a row of a csv report
+    report['writer'].writerow(row)
+
+#----------------------------------------------------------------------------------
+def openKmlReport(kmlFile, name):
+
+    # opens a KML report for GIS software, placemarks are added with writeKmlPlacemark
+    report = openReport(kmlFile)
+    report['file'].write("<?xml version='1.0' encoding='UTF-8'?>\n<kml>\n<Document>\n    <name>" + escape(name) + "</name>\n")
+    report['footer'] = "</Document>\n</kml>\n"
+    return report
+
+#----------------------------------------------------------------------------------
+def writeKmlPlacemark(report, name, description, lat, long, altitude):
+
+    # writes a placemark, position values are strings as written to the other reports
+    report['file'].write("   <Placemark>\n" \
+        + "       <name>" + escape(name) + "</name>\n" \
+        + "       <description>" + escape(description) + "</description>\n" \
+        + "       <Point>\n" \
+        + "           <coordinates>" + long + "," + lat + "," + altitude + "</coordinates>\n" \
+        + "       </Point>\n" \
+        + "   </Placemark>\n")
+
+#----------------------------------------------------------------------------------
+def closeReport(report):
+
+    # finishes a report and replaces the report file with it
+    report['file'].write(report['footer'])
+    report['file'].close()
+    os.replace(report['path'] + '.tmp', report['path'])
+
+#----------------------------------------------------------------------------------
+def parseBatPiSettings(settingsFile, confFile):
+
+    # parses the settings of a Bat-Pi v1 (recordings.sh) or v2 (recordings.sh and recording.conf) into BatPiSettings
+    # raises an exception for unknown firmware versions
+    deviceName = None
+    micVersion = None
+    with open(settingsFile) as batPi:
+        for i, line in enumerate(batPi):
+            if 'Project 2014' in line:
+                deviceName = 'BatPi-v1'  # first Bat-Pi generation
+                deviceFirmware = '1510'  # ROM released in Octobre 2015
+            if '(c) 2014, 2015' in line:
+                deviceName = 'BatPi-v2'  # second Bat-Pi generation
+                deviceFirmware = '1610'  # ROM released in Octobre 2016
+            if 'USBDEVICE_MIC_ID_PREFIX=' in line:
+                micVersion = ''
+                pos1 = line.find('"')
+                pos2 = line.find('"', pos1 + 1)
+                usbDevice = line[pos1 + 1:pos2]
+                if usbDevice == '0869':
+                    micVersion = 'Dodotronic 250'
+                    deviceName = deviceName + '-Dodo250'
+    if deviceName is None or micVersion is None:
+        raise ValueError('Unknown Bat Pi firmware version: ' + settingsFile)
+
+    # init vars for Bat Pi settings
+    preTrigger = ''
+    postTrigger = ''
+    startTreshold = ''
+    stopTreshold = ''
+    startFrequency = ''
+    recordLength = ''
+    volume = ''
+    priority = ''
+    recbuffer = ''
+
+    if(deviceFirmware=='1510'):
+        # get Bat Pi v1 parameters
+        with open(settingsFile) as batPi:
+            for i, line in enumerate(batPi):
+                if 'export' in line:
+                    if 'pauseVorherSec' in line:
+                        pos1=line.find('"')
+                        pos2=line.find('"',pos1+1)
+                        preTrigger = int(float(line[pos1+1:pos2])*1000)
+                    if 'pauseNachherSec' in line:
+                        pos1=line.find('"')
+                        pos2=line.find('"',pos1+1)
+                        postTrigger = int(float(line[pos1+1:pos2])*1000)
+                    if 'schwelleVorher' in line:
+                        pos1=line.find('"')
+                        pos2=line.find('"',pos1+1)
+                        startTreshold = int(float(line[pos1+1:pos2 -1]) * 100)
+                    if 'schwelleNachher' in line:
+                        pos1=line.find('"')
+                        pos2=line.find('"',pos1+1)
+                        stopTreshold = int(float(line[pos1+1:pos2-1]) * 100)
+                    if 'PRIORITY' in line:
+                        pos1=line.find('"')
+                        pos2=line.find('"',pos1+1)
+                        priority = line[pos1+1:pos2]
+                    if 'BUFFER' in line:
+                        pos1=line.find('"')
+                        pos2=line.find('"',pos1+1)
+                        recbuffer = line[pos1+1:pos2]
+                if 'nice' in line:
+                    volume = line[72:73]
+                    startFrequency = int(line[79:81])*1000
+                    recordLength = line[169:170]
+
+    if (deviceFirmware == '1610'):
+        # get Bat Pi v2 parameters
+        with open(confFile) as batPi:
+            for i, line in enumerate(batPi):
+                if 'pauseVorherSec' in line:
+                    pos1 = line.find('=')
+                    preTrigger = int(float(line[pos1 + 1:]) * 1000)
+                if 'pauseNachherSec' in line:
+                    pos1 = line.find('=')
+                    pos2 = line.find('t')
+                    postTrigger = int(float(line[pos1 + 1:pos2]))
+                if 'schwelleVorher' in line:
+                    pos1 = line.find('=')
+                    startTreshold = int(float(line[pos1 + 1:]) * 100)
+                if 'schwelleNachher' in line:
+                    pos1 = line.find('=')
+                    stopTreshold = int(float(line[pos1 + 1:]) * 100)
+                if 'RECVOL' in line:
+                    pos1 = line.find('=')
+                    volume = int(float(line[pos1 + 1:]))
+                if 'TRIGFREQ' in line:
+                    pos1 = line.find('=')
+                    pos2 = line.find('k')
+                    startFrequency = int(float(line[pos1 + 1:pos2])) * 1000
+                if 'TRIMNACH' in line:
+                    pos1 = line.find('=')
+                    recordLength = int(float(line[pos1 + 1:]))
+
+    return BatPiSettings(deviceName, deviceFirmware, micVersion, preTrigger, postTrigger, startTreshold, stopTreshold, \
+        startFrequency, recordLength, volume, priority, recbuffer)
+
+#----------------------------------------------------------------------------------
+def readBatPiSettings(basePath, useDiskCache=True):
+
+    # reads the device settings of the Bat-Pi directory basePath (out/bin/recordings.sh, etc/batpi/recording.conf)
+    # returns a (key, BatPiSettings) tuple, the key is the content hash of the settings files and is the same for
+    # all bat nights and sites with the same device settings
+    # settings files parsed before, by this process or by an earlier run, are only hashed and not parsed again
+    # the disk cache is used unless useDiskCache is False or settingsCachePath is empty
+    useDiskCache = useDiskCache and settingsCachePath != ''
+    settingsFile = basePath + 'out/bin/recordings.sh'
+    confFile = basePath + 'etc/batpi/recording.conf'
+    keyHash = hashlib.sha1(settingsParserVersion.encode('ascii'))
+    keyHash.update(hashFileContent(settingsFile).encode('ascii'))
+    if os.path.exists(confFile):
+        keyHash.update(hashFileContent(confFile).encode('ascii'))
+    key = keyHash.hexdigest()
+
+    if key in settingsCache:
+        return key, settingsCache[key]
+
+    cacheFile = os.path.join(settingsCachePath, key + '.json')
+    settings = None
+    if useDiskCache:
+        try:
+            with open(cacheFile) as fCache:
+                settings = BatPiSettings(**json.load(fCache))
+        except:
+            settings = None    # not cached yet or unreadable, parse again
+
+    if settings is None:
+        settings = parseBatPiSettings(settingsFile, confFile)
+        if useDiskCache:
+            try:
+                if not os.path.exists(settingsCachePath):
+                    os.makedirs(settingsCachePath)
+                # worker processes may write the same cache file at the same time, each uses its own temporary file
+                temporaryFile = cacheFile + '.' + str(os.getpid()) + '.tmp'
+                with open(temporaryFile, 'w') as fCache:
+                    json.dump(settings._asdict(), fCache)
+                os.replace(temporaryFile, cacheFile)
+            except:
+                pass    # the cache is only an optimisation, e.g. a read only home directory
+
+    settingsCache[key] = settings
+    return key, settings
@@ -0,0 +1,86 @@
+#!/usr/lib/python3.2
+
+# General description:
+# The batpi command line, one interpreter for all scripts of this project:
+#   python3 -m batpi nights [options] <site name>
+#   python3 -m batpi batscope-xml [options] <base path> <UTC time correction>
+#   python3 -m batpi ssf-screenshots [<base path>]
+#   python3 -m batpi campaign [options] <root directory>
+#   python3 -m batpi screen [options] [<base path>]
+# The module of a command is only imported when the command runs, so the command line starts fast.
+# Other Python programs, e.g. a cron driver processing many sites, can call runCommand() for each site
+# in the same interpreter, parsed data like scanned directories are then reused.
+
+# Organisation: BI Rettet den Wollenberg e.V. see http://bi-wollenberg.org/ (German site)
+# Author      : FVG - ffhmonitor@gmail.com
+
+# This file is on GitHub: https://github.com/ffhmon/bat-project/batpi/cli.py
+# Licence: GNU General Public Licence v3
+
+# Script history:
+# Version 1.0 - October 17, 2026 - initial commit, subcommands nights, batscope-xml and ssf-screenshots
+#   - new subcommand campaign, processes all Bat-Pi dumps below a root directory
+#   - new subcommand screen, sorts out recordings without bat calls
+
+import importlib, os, sys
+
+# subcommands: module of the batpi package with a main(argv) function and a short description
+commands = dict()
+commands['nights'] = ('makeBatNightDirectories', 'prepare a directory for each bat night of a site')
+commands['batscope-xml'] = ('makeBatScopeXml', 'georeference recordings and write BatScope XML files')
+commands['ssf-screenshots'] = ('processSSFBatScreenshots', 'convert and georeference SSF BAT3 screenshots')
+commands['screen'] = ('screenRecordings', 'screen recordings for bat calls and sort out likely noise')
+commands['campaign'] = ('processCampaign', 'prepare and georeference all Bat-Pi dumps below a root directory')
+
+#----------------------------------------------------------------------------------
+def printUsage():
+
+    print('Usage: python3 -m batpi <command> [options]')
+    print('Commands:')
+    for command in sorted(commands):
+        print('   ' + command.ljust(18) + commands[command][1])
+    print('The options of each command are described in the README and in its module in the batpi package.')
+
+#----------------------------------------------------------------------------------
+def runCommand(command, argv, workingDirectory=None):
+
+    # runs a subcommand in this interpreter and returns its exit code instead of leaving the interpreter
+    # the scripts use the working directory as their default base path, it can be set for the run
+    moduleName = commands[command][0]
+    module = importlib.import_module('batpi.' + moduleName)
+
+    previousDirectory = os.getcwd()
+    try:
+        if workingDirectory is not None:
+            os.chdir(workingDirectory)
+        module.main(list(argv))
+        exitCode = 0
+    except SystemExit as error:
+        if error.code is None:
+            exitCode = 0
+        elif isinstance(error.code, int):
+            exitCode = error.code
+        else:
+            print(error.code)
+            exitCode = 1
+    finally:
+        os.chdir(previousDirectory)
+
+    return exitCode
+
+#----------------------------------------------------------------------------------
+def main(argv=None):
+
+    # runs the command line, argv without the program name
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if len(argv) == 0 or argv[0] not in commands:
+        printUsage()
+        sys.exit(1)
+
+    sys.exit(runCommand(argv[0], argv[1:]))
+
+#----------------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
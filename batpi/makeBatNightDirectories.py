@@ -0,0 +1,759 @@
+#!/usr/lib/python3.2
+
+# General description:
+# This will prepare your bat recordings for further automatic data processing, e.g. with SCAN'R
+# creating a consistent directory structure for each bat observation night
+# bat nights are organized in bat observation sites
+# recordings are moved preserving original file timestamps
+
+# Organisation: BI Rettet den Wollenberg e.V. see http://bi-wollenberg.org/ (German site)
+# Author      : FVG - ffhmonitor@gmail.com
+
+# Tested on Linux Mint 17.3 Rosa and on Mac OS X 10.7.5
+# Works with both Bat-Pi Versions (Bat-Piv1, 2015 and Bat-Piv2, 2016)
+# See http://www.bat-pi.eu/ for more information
+
+#--------------------------------------------------------------------------------
+# Inputs expected:
+#--------------------------------------------------------------------------------
+# 1) a command line parameter with a site name where the bat observation was made. Example:
+# makeBatNightDirectories.py home-monitor
+#
+# 2)typical output paths of the Bat-Pi and a supplemental ENVLOG.TXT, a comma separated file with temperatures
+# Bat-Piv1
+# - /out
+# - /out/ENVLOG.TXT
+#
+# Bat-Piv2
+# - /etc/batpi
+# - /out
+# - /out/ENVLOG.TXT
+#--------------------------------------------------------------------------------
+
+#--------------------------------------------------------------------------------
+# Outputs
+#--------------------------------------------------------------------------------
+# Creates a directory for the site name
+# move recordings in sub directories - one subdirectory for each bat observation night
+# move invalid recordings to a subdirectory
+# move log files to a subdirectory
+# copy all available metadata to their sub directories, preserving Bat-Pi directory structure
+# while running, a journal .batnights-journal in the base path, removed when all is done
+#--------------------------------------------------------------------------------
+
+# This file is on GitHub: https://github.com/ffhmon/bat-project/batpi/makeBatNightDirectories.py
+# Licence: GNU General Public Licence v3
+
+# Script history:
+# 20171126 - Version 1.0
+# 20261017 - Version 1.1 - recordings are found with a single directory scan instead of opening every wav file
+#                        - all moves are planned from one inventory of out/data, new option --dry-run prints the plan
+#                        - new option --link, metadata can be hard linked, reflinked or symlinked into the bat nights
+#                        - new option --slice, writes only the bat night's part of ENVLOG.TXT and the gps tracks
+#                        - new option --target, the site directory can be on another file system,
+#                          files are then copied by --jobs threads, verified by checksum and deleted afterwards
+#                        - all steps are written to a journal before anything is moved, an interrupted run
+#                          can be continued with --resume or undone with --rollback
+#                        - moved into the batpi package, the main program is the function main(argv),
+#                          run by makeBatNightDirectories.py or by python3 -m batpi nights
+
+#----------------------------------------------------------------------------------
+def getBatNightOfTime(localDateTime):
+
+    # a bat night lasts from noon to noon, everything before noon belongs to the previous day
+    if localDateTime.hour < 12:
+        theBatNight = localDateTime - datetime.timedelta(days = 1)
+    else:
+        theBatNight = localDateTime
+
+    return theBatNight.strftime("%Y%m%d")
+
+#----------------------------------------------------------------------------------
+def getBatNight(wavFileName):
+
+    # the bat night of a recording, taken from the date time in its file name
+    wavFileDateElements = parseWavFileDateTime(wavFileName)
+    return getBatNightOfTime(wavFileDateElements['wavDateTime'])
+
+#----------------------------------------------------------------------------------
+def sliceEnvironmentLog(envLogFile, batNights):
+
+    # splits the lines of an environment log (data format: D.M.Y;H:MM;T;H, local time) into the given bat nights
+    # returns a dict with a list of lines for each bat night, lines of other days are dropped
+    nightLines = dict((night, list()) for night in batNights)
+
+    with open(envLogFile) as tempFile:
+        for tline in tempFile:
+            try:
+                tempDateTime, fields = parseEnvironmentLogLine(tline)
+            except ValueError:
+                continue
+
+            night = getBatNightOfTime(tempDateTime)
+            if night in nightLines:
+                nightLines[night].append(tline)
+
+    return nightLines
+
+#----------------------------------------------------------------------------------
+def sliceGpxFile(gpxFile, batNights, utcTimeCorrection):
+
+    # splits the track points of a gpx file (UTC) into the given bat nights (local time)
+    # points up to sliceMarginSeconds around noon go into both nights, so georeferencing at the edges still works
+    # returns a dict with a list of GpxTrackpoint tuples for each bat night
+    nightPoints = dict((night, list()) for night in batNights)
+
+    for point in iterGpxTrackpoints(gpxFile):
+        pointDateTime = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=point.time, hours=utcTimeCorrection)
+        margin = datetime.timedelta(seconds=sliceMarginSeconds)
+        for night in set((getBatNightOfTime(pointDateTime - margin), getBatNightOfTime(pointDateTime + margin))):
+            if night in nightPoints:
+                nightPoints[night].append(point)
+
+    return nightPoints
+
+#----------------------------------------------------------------------------------
+def sliceFile(source, batNights, utcTimeCorrection):
+
+    # splits ENVLOG.TXT or a gpx file into the given bat nights, see sliceEnvironmentLog and sliceGpxFile
+    if os.path.basename(source) == 'ENVLOG.TXT':
+        return sliceEnvironmentLog(source, batNights)
+    return sliceGpxFile(source, batNights, utcTimeCorrection)
+
+#----------------------------------------------------------------------------------
+def writeNightSlice(source, nightSlice, nightTarget):
+
+    # writes the bat night's part of a sliced metadata file (see sliceFile)
+    if os.path.basename(source) == 'ENVLOG.TXT':
+        with open(nightTarget, 'w') as fEnvLog:
+            fEnvLog.writelines(nightSlice)
+    else:
+        writeGpxTrackpoints(nightTarget, nightSlice, 'makeBatNightDirectories.py')
+
+#----------------------------------------------------------------------------------
+def duplicateFile(source, target, linkMode):
+
+    # duplicates a metadata file into a bat night directory
+    # linkMode 'hardlink', 'reflink' (copy on write clone, e.g. on btrfs or xfs) and 'symlink' save disk space and time
+    # if the file system does not support the link mode, the file is copied
+    # note that hard links share their content - edit a linked file and all bat nights see the change
+    try:
+        if linkMode == 'hardlink':
+            os.link(source, target)
+            return 'linked'
+        if linkMode == 'symlink':
+            os.symlink(os.path.relpath(source, os.path.dirname(target)), target)
+            return 'linked'
+        if linkMode == 'reflink':
+            with open(source, 'rb') as fSource, open(target, 'wb') as fTarget:
+                fcntl.ioctl(fTarget.fileno(), FICLONE, fSource.fileno())
+            copystat(source, target)
+            return 'linked'
+    except (OSError, IOError, NameError):
+        # NameError: no fcntl module on this system
+        if os.path.lexists(target):
+            os.remove(target)
+
+    copyfile(source, target)
+    return 'copied'
+
+#----------------------------------------------------------------------------------
+def hashFile(fileName):
+
+    # sha1 checksum of a file, used to verify copies
+    fileHash = hashlib.sha1()
+    with open(fileName, 'rb') as f:
+        for block in iter(lambda: f.read(copyBlockSize), b''):
+            fileHash.update(block)
+    return fileHash.hexdigest()
+
+#----------------------------------------------------------------------------------
+def copyVerifyDelete(source, target):
+
+    # moves a file to another file system: copies it into a temporary file, preserving its time stamps,
+    # reads the copy back and compares checksums, and only then renames the copy and deletes the source
+    targetPart = target + '.part'
+    sourceHash = hashlib.sha1()
+    with open(source, 'rb') as fSource, open(targetPart, 'wb') as fTarget:
+        for block in iter(lambda: fSource.read(copyBlockSize), b''):
+            sourceHash.update(block)
+            fTarget.write(block)
+        fTarget.flush()
+        os.fsync(fTarget.fileno())
+    copystat(source, targetPart)
+
+    if hashFile(targetPart) != sourceHash.hexdigest():
+        os.remove(targetPart)
+        raise IOError('Checksum mismatch copying ' + source + ' to ' + target)
+
+    os.rename(targetPart, target)
+    os.remove(source)
+
+#----------------------------------------------------------------------------------
+def moveFiles(moves, jobs):
+
+    # moves a list of (source, target) files
+    # targets on the same file system are simply renamed, which keeps the original file time stamps
+    # targets on another file system (e.g. card reader to NAS) are copied by a pool of jobs threads,
+    # with at most maxInFlightBytes being copied at the same time, verified and deleted afterwards
+    crossDevice = list()
+    targetDevices = dict()
+    for source, target in moves:
+        targetDirectory = os.path.dirname(target)
+        if targetDirectory not in targetDevices:
+            targetDevices[targetDirectory] = os.stat(targetDirectory).st_dev
+        if os.stat(source).st_dev == targetDevices[targetDirectory]:
+            os.rename(source, target)
+        else:
+            crossDevice.append((source, target))
+
+    if len(crossDevice) == 0:
+        return
+
+    inFlight = dict(bytes=0)
+    inFlightChanged = threading.Condition()
+
+    def releaseBytes(size):
+        with inFlightChanged:
+            inFlight['bytes'] = inFlight['bytes'] - size
+            inFlightChanged.notify_all()
+
+    futures = list()
+    with ThreadPoolExecutor(jobs) as executor:
+        for source, target in crossDevice:
+            size = os.path.getsize(source)
+            with inFlightChanged:
+                # a file bigger than the limit is copied when nothing else is in flight
+                while inFlight['bytes'] > 0 and inFlight['bytes'] + size > maxInFlightBytes:
+                    inFlightChanged.wait()
+                inFlight['bytes'] = inFlight['bytes'] + size
+            future = executor.submit(copyVerifyDelete, source, target)
+            future.add_done_callback(lambda done, size=size: releaseBytes(size))
+            futures.append(future)
+
+    # raise the first copy error, if any
+    for future in futures:
+        future.result()
+
+#----------------------------------------------------------------------------------
+def moveTree(sourceDirectory, targetDirectory, jobs):
+
+    # moves a directory tree, renaming it on the same file system or moving file by file to another one
+    # file by file also merges into a target directory that already exists, e.g. after an interrupted move
+    targetParent = os.path.dirname(os.path.normpath(targetDirectory))
+    if os.stat(sourceDirectory).st_dev == os.stat(targetParent).st_dev and not os.path.exists(targetDirectory):
+        os.rename(sourceDirectory, targetDirectory)
+        return
+
+    moves = list()
+    for directory, subDirectories, files in os.walk(sourceDirectory):
+        newDirectory = os.path.join(targetDirectory, os.path.relpath(directory, sourceDirectory))
+        if not os.path.exists(newDirectory):
+            os.makedirs(newDirectory)
+        for theFile in files:
+            source = os.path.join(directory, theFile)
+            target = os.path.join(newDirectory, theFile)
+            if theFile.endswith('.part') and (os.path.exists(source[:-5]) or os.path.exists(target[:-5])):
+                os.remove(source)    # unfinished copy of an interrupted move, see copyVerifyDelete
+                continue
+            moves.append((source, target))
+    moveFiles(moves, jobs)
+
+    # all files are moved and verified, remove the empty source directories
+    for directory, subDirectories, files in os.walk(sourceDirectory, topdown=False):
+        os.rmdir(directory)
+
+#----------------------------------------------------------------------------------
+def planReorganisation(basePath, sitePath, siteName, inventory, sliceNights):
+
+    # lists every step of the reorganisation as an (action, source, target, extra) tuple, in the order they are run:
+    # mkdir (a directory), move (a file, extra is the bat night of a recording), tree (a directory tree),
+    # site (write SITE.TXT, extra is the site name), link (duplicate a metadata file), slice (extra is the bat night)
+    # and note (print extra)
+    # all paths are known from the inventory and the top level of the base path, nothing is moved or scanned again
+    steps = list()
+
+    def step(action, source='', target='', extra=''):
+        steps.append((action, source, target, extra))
+
+    # move everything to the site directory and create a file for the site
+    dataPath = sitePath + 'out/data/'
+    step('mkdir', target=sitePath)
+    for item in sorted(glob.glob(basePath + '*.*')):
+        step('move', item, sitePath + os.path.basename(item))
+    step('tree', basePath + 'out', sitePath + 'out')
+    if os.path.exists(basePath + 'etc/batpi'):    #only batpiv2 has /etc/batpi
+        step('tree', basePath + 'etc', sitePath + 'etc')
+    step('site', target=sitePath + 'SITE.TXT', extra=siteName)
+
+    # move invalid recordings (wav file is smaller as 1000 bytes) and log files, if any
+    for category, directory, description in (('invalid', 'invalid-wav', ' invalid wav files.'), ('logs', 'logs', ' log files.')):
+        step('note', extra=str(len(inventory[category])) + description)
+        if len(inventory[category]) > 0:
+            step('mkdir', target=dataPath + directory)
+            for name in inventory[category]:
+                step('move', dataPath + name, dataPath + directory + '/' + name)
+            for name in inventory[category]:
+                step('note', extra=name + ' --> moved to ' + directory + ' path')
+        step('note', extra='----------------------------------------------------------------')
+
+    step('note', extra=str(len(inventory['valid'])) + ' valid wav files found.')
+    step('note', extra='----------------------------------------------------------------')
+    step('note', extra='Reading a bunch of files. This may take some time. Please hang on...')
+    step('note', extra='====================================================================')
+
+    # metadata files (paths relative to the site directory) are the same for all bat nights:
+    # environment file, site name file, log data, gps data, settings directory for batpi v1 and v2 - if found
+    metadata = list()
+    if os.path.exists(basePath + 'ENVLOG.TXT') or os.path.exists(sitePath + 'ENVLOG.TXT'):
+        metadata.append('ENVLOG.TXT')
+    metadata.append('SITE.TXT')
+    for nightDirectory in nightDirectories:
+        names = set(os.path.basename(item) for item in glob.glob(basePath + nightDirectory + '/*.*') + glob.glob(sitePath + nightDirectory + '/*.*'))
+        if nightDirectory == 'out/data/logs':
+            names.update(inventory['logs'])
+        metadata.extend(nightDirectory + '/' + name for name in sorted(names))
+
+    # create the Bat-Pi directory structure and duplicate all metadata into each bat night
+    for night in sorted(inventory['nights']):
+        nightPath = sitePath + night + '/'
+        step('note', extra='Processing bat night: ' + night)
+        for nightDirectory in ('', 'out', 'out/data', 'etc') + nightDirectories:
+            step('mkdir', target=nightPath + nightDirectory)
+        for target in metadata:
+            if sliceNights and (target == 'ENVLOG.TXT' or (target.startswith('out/data/gps/') and target.endswith('.gpx'))):
+                step('slice', sitePath + target, nightPath + target, night)
+            else:
+                step('link', sitePath + target, nightPath + target)
+
+    # copying files would result in changed time stamps and occupies a lot of disk space - moving the wav-files is the better solution
+    for night in sorted(inventory['nights']):
+        for name in inventory['nights'][night]:
+            step('move', dataPath + name, sitePath + night + '/out/data/' + name, night)
+
+    return steps
+
+#----------------------------------------------------------------------------------
+def writeJournal(journalFile, steps, settings):
+
+    # writes the planned steps to the journal before anything is moved (write ahead) and syncs it to disk
+    # returns the journal file, open for appending the progress marks of runJournal
+    fJournal = open(journalFile, 'w')
+    fJournal.write('# makeBatNightDirectories.py journal - do not edit, run the script with --resume or --rollback\n')
+    for name in sorted(settings):
+        fJournal.write('setting\t' + name + '\t' + settings[name] + '\n')
+    fJournal.writelines('step\t' + '\t'.join(step) + '\n' for step in steps)
+    fJournal.write('plan\t' + str(len(steps)) + '\n')
+    fJournal.flush()
+    os.fsync(fJournal.fileno())
+
+    # make sure the journal's directory entry is on disk as well
+    directoryHandle = os.open(os.path.dirname(journalFile), os.O_RDONLY)
+    os.fsync(directoryHandle)
+    os.close(directoryHandle)
+
+    return fJournal
+
+#----------------------------------------------------------------------------------
+def readJournal(journalFile):
+
+    # reads a journal written by writeJournal and runJournal
+    # planned is False if the run stopped while writing the plan - nothing was moved then
+    # steps before 'done' are finished, steps from 'begun' on were never started
+    journal = dict(settings=dict(), steps=list(), planned=False, begun=0, done=0)
+
+    with open(journalFile) as fJournal:
+        for line in fJournal:
+            if not line.endswith('\n'):
+                break    # last line was not completely written
+            fields = line[:-1].split('\t')
+            if fields[0] == 'setting':
+                journal['settings'][fields[1]] = fields[2]
+            elif fields[0] == 'step':
+                journal['steps'].append(tuple(fields[1:5]))
+            elif fields[0] == 'plan':
+                journal['planned'] = True
+            elif fields[0] == 'begin':
+                journal['begun'] = int(fields[1])
+            elif fields[0] == 'done':
+                journal['done'] = int(fields[1])
+
+    return journal
+
+#----------------------------------------------------------------------------------
+def markJournal(fJournal, mark, stepNumber):
+
+    # appends a progress mark to the journal and syncs it to disk
+    fJournal.write(mark + '\t' + str(stepNumber) + '\n')
+    fJournal.flush()
+    os.fsync(fJournal.fileno())
+
+#----------------------------------------------------------------------------------
+def runJournal(fJournal, journal, jobs):
+
+    # runs the journal's steps from the last 'done' mark on, in batches of journalBatchSize steps
+    # each batch is marked 'begin' before and 'done' after it ran, so the journal is only synced twice per batch
+    # every step checks what is already there, so steps of an interrupted batch can simply be run again
+    # consecutive moves are passed to moveFiles together, to copy them in parallel to another file system
+    steps = journal['steps']
+    linkMode = journal['settings']['link']
+    utcTimeCorrection = int(journal['settings']['utc'])
+    stats = dict(files=0, nights=set(), linked=0, copied=0)
+    nightSlices = dict()
+    pendingMoves = list()
+
+    def flushMoves():
+        # a move is finished if its source is gone and its target is there
+        moveFiles([(source, target) for source, target in pendingMoves \
+            if os.path.lexists(source) or not os.path.lexists(target)], jobs)
+        del pendingMoves[:]
+
+    for batchStart in range(journal['done'], len(steps), journalBatchSize):
+        batchEnd = min(batchStart + journalBatchSize, len(steps))
+        markJournal(fJournal, 'begin', batchEnd)
+
+        for action, source, target, extra in steps[batchStart:batchEnd]:
+            if action == 'move':
+                pendingMoves.append((source, target))
+                if extra != '':
+                    stats['files'] = stats['files'] + 1
+                    stats['nights'].add(extra)
+                continue
+
+            flushMoves()
+            if action == 'mkdir':
+                if not os.path.exists(target):
+                    os.makedirs(target)
+            elif action == 'tree':
+                if os.path.exists(source):
+                    moveTree(source, target, jobs)
+            elif action == 'site':
+                with open(target, 'w') as fTXT:
+                    fTXT.write(extra)
+            elif action == 'link':
+                if os.path.lexists(target):
+                    os.remove(target)
+                linkResult = duplicateFile(source, target, linkMode)
+                stats[linkResult] = stats[linkResult] + 1
+            elif action == 'slice':
+                # split each file once, into all bat nights it is sliced into
+                if source not in nightSlices:
+                    batNights = set(other[3] for other in steps if other[0] == 'slice' and other[1] == source)
+                    nightSlices[source] = sliceFile(source, batNights, utcTimeCorrection)
+                writeNightSlice(source, nightSlices[source][extra], target)
+            elif action == 'note':
+                print(extra)
+
+        flushMoves()
+        markJournal(fJournal, 'done', batchEnd)
+
+    return stats
+
+#----------------------------------------------------------------------------------
+def rollbackJournal(journal, jobs):
+
+    # undoes every step that was started, in reverse order: moves files and directory trees back,
+    # removes written and duplicated metadata files and the directories if they are empty
+    pendingMoves = list()
+
+    def flushMoves():
+        moveFiles(pendingMoves, jobs)
+        del pendingMoves[:]
+
+    for action, source, target, extra in reversed(journal['steps'][:journal['begun']]):
+        if action == 'move':
+            if os.path.lexists(target + '.part'):
+                os.remove(target + '.part')    # interrupted copy to another file system
+            if os.path.lexists(target):
+                if os.path.lexists(source):
+                    os.remove(target)    # verified copy, the source was not deleted yet
+                else:
+                    pendingMoves.append((target, source))
+            continue
+
+        flushMoves()
+        if action == 'tree':
+            if os.path.exists(target):
+                moveTree(target, source, jobs)
+        elif action == 'mkdir':
+            if os.path.isdir(target) and len(os.listdir(target)) == 0:
+                os.rmdir(target)
+        elif action in ('site', 'link', 'slice'):
+            if os.path.lexists(target):
+                os.remove(target)
+
+    flushMoves()
+
+#----------------------------------------------------------------------------------
+def makeInventory(dataPath):
+
+    # lists the Bat-Pi data directory once and classifies every entry:
+    # valid recordings ('-N-' wav files bigger than 1000 bytes), invalid (too small) wav files, log files and other entries
+    # all moves of this script are planned from this inventory, no directory is scanned again
+    inventory = dict(valid=list(), invalid=list(), logs=list(), other=list(), sizes=dict(), nights=dict())
+
+    for entry in os.scandir(dataPath):
+        if entry.is_dir():
+            continue
+        entrySize = entry.stat().st_size
+        inventory['sizes'][entry.name] = entrySize
+
+        if entry.name.endswith('.wav'):
+            wavEntry = dict(path=entry.path, name=entry.name, size=entrySize)
+            if isInvalidWav(wavEntry):
+                inventory['invalid'].append(entry.name)
+            elif isValidRecording(wavEntry):
+                inventory['valid'].append(entry.name)
+            else:
+                inventory['other'].append(entry.name)
+        elif fnmatch.fnmatch(entry.name, '*.log*'):
+            inventory['logs'].append(entry.name)
+        else:
+            inventory['other'].append(entry.name)
+
+    for category in ('valid', 'invalid', 'logs', 'other'):
+        inventory[category].sort()
+
+    # group the valid recordings by bat night, keeping the recording order
+    for currentWav in inventory['valid']:
+        inventory['nights'].setdefault(getBatNight(currentWav), list()).append(currentWav)
+
+    return inventory
+
+#----------------------------------------------------------------------------------
+def printInventory(inventory):
+
+    # prints what this script would do with the inventory, used for dry runs
+    def totalSize(names):
+        return sum(inventory['sizes'][name] for name in names)
+
+    def sizeString(size):
+        return '%.1f MB' % (size / 1000000.0)
+
+    print('Planned actions (dry run, nothing is moved):')
+    print('----------------------------------------------------------------')
+    print(str(len(inventory['invalid'])) + ' invalid wav files (' + sizeString(totalSize(inventory['invalid'])) + ') --> out/data/invalid-wav')
+    print(str(len(inventory['logs'])) + ' log files (' + sizeString(totalSize(inventory['logs'])) + ') --> out/data/logs')
+    print(str(len(inventory['other'])) + ' other files (' + sizeString(totalSize(inventory['other'])) + ') --> stay in out/data')
+    print(str(len(inventory['valid'])) + ' valid wav files (' + sizeString(totalSize(inventory['valid'])) + ') in ' \
+        + str(len(inventory['nights'])) + ' bat nights:')
+    for night in sorted(inventory['nights']):
+        nightFiles = inventory['nights'][night]
+        print('   ' + night + ' : ' + str(len(nightFiles)) + ' recordings (' + sizeString(totalSize(nightFiles)) + ')')
+    print('----------------------------------------------------------------')
+
+# ==================================================================================================================
+# Main program
+# ==================================================================================================================
+
+import datetime, fnmatch, getopt, glob, hashlib, os, sys, threading
+from concurrent.futures import ThreadPoolExecutor
+from shutil import copyfile, copystat
+from .batPiCommon import parseWavFileDateTime, parseEnvironmentLogLine, isInvalidWav, isValidRecording, iterGpxTrackpoints, writeGpxTrackpoints
+try:
+    import fcntl
+except ImportError:
+    pass
+
+# ioctl request to clone a file on Linux copy on write file systems
+FICLONE = 0x40049409
+
+# gps track points this close to noon are put into the sliced tracks of both bat nights
+sliceMarginSeconds = 3600
+
+# moves to another file system: block size for copying and upper limit of bytes being copied at the same time
+copyBlockSize = 1024 * 1024
+maxInFlightBytes = 256 * 1024 * 1024
+
+# metadata directories duplicated into every bat night
+nightDirectories = ('out/data/logs', 'out/data/gps', 'out/bin', 'etc/batpi')
+
+# the journal of planned moves is synced to disk after every batch of this many steps
+journalBatchSize = 1000
+
+#----------------------------------------------------------------------------------
+def main(argv):
+
+    # runs the script with the command line arguments argv (without the script name)
+
+    # default variables - can be changed by sys.argv ###
+
+    # default base path - user's working directory
+    basePath = os.getcwd() + '/'
+    siteName = ''
+
+    # only print the planned actions, do not move anything
+    dryRun = False
+
+    # how metadata files are duplicated into the bat nights: copy, hardlink, reflink or symlink
+    linkMode = 'copy'
+
+    # write only the bat night's part of ENVLOG.TXT and the gps tracks into each bat night
+    sliceNights = False
+
+    # UTC time correction in hours, used to find the bat nights of gps track points
+    # For Germany, set to 1 for bat sounds recorded during winter time, use 2 for sounds recorded during summer
+    utcTimeCorrection = 2
+
+    # directory in which the site directory is created - default is the base path
+    # can be on another file system, e.g. a NAS, files are then copied, verified and deleted
+    targetPath = ''
+
+    # number of threads copying files to another file system
+    jobs = 4
+
+    # continue or undo an interrupted run, using the journal it left in the base path
+    resumeRun = False
+    rollbackRun = False
+
+    ### parse command line args
+    try:    
+        options, arguments = getopt.gnu_getopt(argv, 'nj:', ['dry-run', 'link=', 'slice', 'utc=', 'target=', 'jobs=', 'resume', 'rollback'])
+        for option, value in options:
+            if option in ('-n', '--dry-run'):
+                dryRun = True
+            if option == '--link':
+                if value not in ('copy', 'hardlink', 'reflink', 'symlink'):
+                    raise ValueError('Unknown link mode: ' + value)
+                linkMode = value
+            if option == '--slice':
+                sliceNights = True
+            if option == '--utc':
+                utcTimeCorrection = int(value)
+            if option == '--target':
+                targetPath = os.path.abspath(value) + '/'
+            if option in ('-j', '--jobs'):
+                jobs = int(value)
+                if jobs < 1:
+                    raise ValueError('Number of jobs must be at least 1.')
+            if option == '--resume':
+                resumeRun = True
+            if option == '--rollback':
+                rollbackRun = True
+
+        args = (len(arguments) + 1)
+
+        if resumeRun and rollbackRun:
+            raise ValueError('Use either --resume or --rollback.')
+        elif (args==1) and (resumeRun or rollbackRun):
+            pass    # the site name is taken from the journal
+        elif (args!=2):
+            raise ValueError('Missing site name argument.')
+        else:
+            candidateSiteName = str(arguments[0])
+            if candidateSiteName != '':
+                siteName = candidateSiteName.replace('/','')
+
+    except Exception as error:
+        print("Invalid command arguments. Usage: makeBatNightDirectories.py [--dry-run] [--link copy|hardlink|reflink|symlink] [--slice [--utc N]] [--target DIR] [--jobs N] <site name>")
+        print("       makeBatNightDirectories.py --resume|--rollback [--jobs N]")
+        print (siteName)
+        sys.exit(1)
+
+    print ("Base path: " + basePath)
+
+    # a run writes its planned steps into a journal first and removes it when all is done
+    journalFile = basePath + '.batnights-journal'
+    journal = None
+    if os.path.exists(journalFile):
+        journal = readJournal(journalFile)
+        if not journal['planned']:
+            # the run stopped while writing its plan, nothing was moved yet
+            os.remove(journalFile)
+            journal = None
+
+    if journal is None and (resumeRun or rollbackRun):
+        print('No interrupted run found, nothing to resume or roll back. Bye now.')
+        sys.exit(1)
+
+    if journal is not None:
+        siteName = journal['settings']['site']
+        print ("Site name: " + siteName)
+        print('----------------------------------------------------------------')
+        if rollbackRun:
+            try:
+                rollbackJournal(journal, jobs)
+                os.remove(journalFile)
+            except:
+                print("Error rolling back the interrupted run. Please try again.")
+                sys.exit(1)
+            print('Rolled back ' + str(journal['begun']) + ' of ' + str(len(journal['steps'])) + ' steps of the interrupted run. Bye now.')
+            sys.exit(0)
+        if not resumeRun:
+            print('An interrupted run left a journal: ' + journalFile)
+            print('Run again with --resume to continue or with --rollback to undo it.')
+            sys.exit(1)
+        print('Resuming at step ' + str(journal['done'] + 1) + ' of ' + str(len(journal['steps'])) + '.')
+        fJournal = open(journalFile, 'a')
+
+    else:
+        print ("Site name: " + siteName)
+        if targetPath == '':
+            targetPath = basePath
+        else:
+            print ("Target path: " + targetPath)
+        print('----------------------------------------------------------------')
+
+        try:
+            # set input directory an check if there is anything to process
+            piRawDataPath = basePath + "out/data/"
+
+            if not os.path.exists(piRawDataPath):
+                print('Sorry, can not find the Bat-Pi raw data input directory:')
+                print(piRawDataPath)
+                sys.exit(1)
+
+        except:
+            print("Error accessing Bat-Pi files.")
+            sys.exit(1)
+
+        try:
+            # take an inventory of the raw data directory - this is the only directory scan
+            inventory = makeInventory(piRawDataPath)
+            wavNumber = len(inventory['valid'])
+
+        except:
+            print("Error reading Bat Pi *.wav")
+            sys.exit(1)
+
+        if dryRun:
+            printInventory(inventory)
+            print('Dry run, nothing moved. Bye now.')
+            sys.exit(0)
+
+        # if no recordings found, there is nothing to do
+        if wavNumber==0:
+            print('Sorry, no recordings found. Nothing to do here. Bye now.')
+            sys.exit(2)
+
+        try:
+            # plan all steps and write them to the journal before anything is moved
+            sitePath = targetPath + siteName + '/'
+            steps = planReorganisation(basePath, sitePath, siteName, inventory, sliceNights)
+            settings = dict(site=siteName, link=linkMode, utc=str(utcTimeCorrection))
+            fJournal = writeJournal(journalFile, steps, settings)
+            journal = dict(settings=settings, steps=steps, done=0)
+
+        except:
+            print("Unexpected error planning the moves for the site.")
+            sys.exit(1)
+
+    try:
+        stats = runJournal(fJournal, journal, jobs)
+        fJournal.close()
+        os.remove(journalFile)
+    except:
+        print('Error reorganising the Bat-Pi files. The journal ' + journalFile + ' keeps track of all steps.')
+        print('Run again with --resume to continue or with --rollback to undo all moves.')
+        sys.exit(1)
+
+    print('----------------------------------------------------------------')
+    print (str(stats['files']) + ' files processed, ' + str(len(stats['nights'])) + ' bat nights found.')
+    if journal['settings']['link'] != 'copy':
+        print (str(stats['linked']) + ' metadata files linked (' + journal['settings']['link'] + '), ' + str(stats['copied']) + ' copied.')
+    print('----------------------------------------------------------------')
+    print('All done. Bye now.')
+
+#----------------------------------------------------------------------------------
+if __name__ == '__main__':
+    main(sys.argv[1:])
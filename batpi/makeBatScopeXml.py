@@ -0,0 +1,820 @@
+#!/usr/lib/python3.2
+
+# General description:
+# Script for Raspberry Bat Pi v1 (first edition). See http://www.bat-pi.eu for more information.
+# Georeferences bat call recordings (WAV files), and finds temperatures for each recording
+# It creates XML meta data files, allowing the recordings to be transferred to BatScope analyser software. See http://www.batscope.ch/ 
+# The script serves a bat survey as part of a fauna, flora and habitat monitoring project 
+# Organisation: BI Rettet den Wollenberg e.V. see http://bi-wollenberg.org/ (German site)
+# Author      : FVG - ffhmonitor@gmail.com
+
+# Script actions in detail:
+# - it reads current Bat Pi device settings from /out/bin/recordings.sh
+# - it reads GPS track points from /out/data/gps (gpx-file or an alternative 'fixed-geo.txt') and geo references all recordings
+# - it reads logged temperatures from a /out/ENVLOG.TXT file for each recording
+# - it writes an XML file for each wav recording with device settings, GPS data and temperatures into /out/data/batscope/ 
+# - it writes a session KML file with georeferenced recordings into /out/data/reports/pi-route.kml for use with GIS software
+# - it writes a session index with the BatScope records of all recordings into /out/data/batscope/batscope-index.csv
+# - it writes a session XML and CSV with archived device settings for the current session into /out/data/reports/pi-session.xml and pi-session.csv
+
+# Note, that a special ImporterModule for BatScope is needed. 
+# Look for the Bat-Pi v1 Importer at https://github.com/ffhmon/bat-project
+
+# Tested with Bat-Pi v1 and v2
+# Runs on Linux Mint 17.3 Rosa and on Mac OS X 10.7.5
+# Typical path on the Bat-Pi would be: /out/bin
+# This file is on GitHub: https://github.com/ffhmon/bat-project/batpi/makeBatScopeXml.py
+# Licence: GNU General Public Licence v3
+
+# Script history:
+# Version 1.0 - January 6, 2017 - initial commit
+
+# Version 1.1 - January 8, 2017
+#   - added log output, added organisation reference
+
+# Version 1.2 - May 7, 2017
+#   - fixed Syntax error causing 'Wrong Bat Pi firmware version' message
+
+# Version 1.3 - November 26, 2017
+#   - fixed incorrect trigger percentage display
+#   - added support for Bat Pi v2
+
+# Version 1.4 - October 17, 2026
+#   - gpx track points are parsed once into a time sorted index, recordings are located by binary search
+#   - ENVLOG.TXT is parsed once into a temperature timeline (see batPiCommon.py)
+#   - gpx files are read with a streaming XML parser instead of fixed line and column positions
+#   - new option --jobs N, processes recordings in N worker processes
+#   - keeps a manifest in reports/batscope-manifest.csv, reruns only rebuild XML files of new or changed recordings
+#     new option --rebuild, rebuilds all XML files
+#   - XML records are rendered from a template with escaped values and written atomically
+#     new option --bundle, writes all records into /out/data/batscope/batscope-session.xml instead of one file per recording
+#   - recordings are found with a single directory scan instead of opening every wav file
+#     new option --check-wav, skips recordings without a valid wav header or audio data
+#   - all recordings are georeferenced in a single call, vectorized with numpy if it is installed
+#   - new options --gps-mode window|nearest|interpolate and --gps-tolerance SECONDS for sparse gps tracks
+#   - moved into the batpi package, the main program is the function main(argv),
+#     run by makeBatScopeXml.py or by python3 -m batpi batscope-xml
+#   - writes a session index /out/data/batscope/batscope-index.csv with the BatScope records of all recordings,
+#     the importer reads it once instead of one XML file per recording
+#   - device settings are read by readBatPiSettings() in batPiCommon.py and cached on disk by file content,
+#     bat nights and sites with the same settings files reuse one parse
+#   - exits with code 1 on errors, also if a BatScope XML file could not be written, and 2 if there are
+#     no recordings, so batch runs can detect failures
+
+#----------------------------------------------------------------------------------
+def getWavFileTemperature(wavFile, envLog):
+
+    # takes the date time from a wav file name and finds a corresponding temperature in the environment log timeline
+    # see readEnvironmentLog() in batPiCommon.py for the log file format
+
+    # if no valid temperature can be found, we use -1000 degrees Celsius
+    theTemperature = -1000
+
+    try:
+        currentWav = os.path.basename(wavFile)
+        wavFileDateElements = parseWavFileDateTime(currentWav)
+
+        tempTemperature = findTemperature(envLog, wavFileDateElements['wavDateTime'])
+        if tempTemperature is not None:
+            theTemperature = round(tempTemperature)
+
+    except:
+        print('Error parsing temperature.')
+        e = sys.exc_info()
+        print(e)
+        theTemperature = float(-1000)
+
+    return theTemperature
+
+#----------------------------------------------------------------------------------
+# template of a BatScope XML record, rendered in one pass by renderBatScopeXml()
+batScopeRecordTemplate = "<BatScopeRecord>\n" \
+    "   <FileName>%(FileName)s</FileName>\n" \
+    "   <BatRecDeviceName>%(BatRecDeviceName)s</BatRecDeviceName>\n" \
+    "   <BatRecDate>%(BatRecDate)s</BatRecDate>\n" \
+    "   <BatRecSpeed>1</BatRecSpeed>\n" \
+    "   <BatRecLocationDevice>%(BatRecLocationDevice)s</BatRecLocationDevice>\n" \
+    "   <BatRecGPSValid>%(BatRecGPSValid)s</BatRecGPSValid>\n" \
+    "   <BatRecGPSLat>%(BatRecGPSLat)s</BatRecGPSLat>\n" \
+    "   <BatRecGPSLong>%(BatRecGPSLong)s</BatRecGPSLong>\n" \
+    "   <BatRecGPSAltitude>%(BatRecGPSAltitude)s</BatRecGPSAltitude>\n" \
+    "   <BatRecGPSHDOP>%(BatRecGPSHDOP)s</BatRecGPSHDOP>\n" \
+    "   <BatRecGPSSatsUsed>%(BatRecGPSSatsUsed)s</BatRecGPSSatsUsed>\n" \
+    "   <BatRecTemperature>%(BatRecTemperature)s</BatRecTemperature>\n" \
+    "   <BatRecDeviceID>%(BatRecDeviceID)s</BatRecDeviceID>\n" \
+    "   <BatRecDeviceFirmware>%(BatRecDeviceFirmware)s</BatRecDeviceFirmware>\n" \
+    "   <BatRecTriggerCutOffFreqEff>%(BatRecTriggerCutOffFreqEff)s</BatRecTriggerCutOffFreqEff>\n" \
+    "   <BatRecPreTriggerTime>%(BatRecPreTriggerTime)s</BatRecPreTriggerTime>\n" \
+    "   <BatRecPostTriggerTime>%(BatRecPostTriggerTime)s</BatRecPostTriggerTime>\n" \
+    "</BatScopeRecord>\n"
+
+# columns of the session index batscope-index.csv, one row with the fields of the BatScope record of each recording
+batScopeIndexFields = ('FileName', 'BatRecDeviceName', 'BatRecDate', 'BatRecSpeed', 'BatRecLocationDevice', 'BatRecGPSValid', \
+    'BatRecGPSLat', 'BatRecGPSLong', 'BatRecGPSAltitude', 'BatRecGPSHDOP', 'BatRecGPSSatsUsed', 'BatRecTemperature', \
+    'BatRecDeviceID', 'BatRecDeviceFirmware', 'BatRecTriggerCutOffFreqEff', 'BatRecPreTriggerTime', 'BatRecPostTriggerTime')
+
+#----------------------------------------------------------------------------------
+def renderBatScopeXml(fileName, recDeviceName, recDate, recLocationDevice, GPSValid, \
+                                                 GPSLat, GPSLong, GPSAlt, GPSHdop, GPSSats, Temperature, \
+                                                 recDeviceID, recDeviceFirmware, \
+                                                 recDeviceStartFrequency, recDevicePreTrigger, recDevicePostTrigger):
+        # returns the XML text of a BatScope record, all values are escaped
+        values = dict(FileName=fileName, BatRecDeviceName=recDeviceName, BatRecDate=recDate, \
+                BatRecLocationDevice=recLocationDevice, BatRecGPSValid=GPSValid, \
+                BatRecGPSLat=GPSLat, BatRecGPSLong=GPSLong, BatRecGPSAltitude=GPSAlt, \
+                BatRecGPSHDOP=GPSHdop, BatRecGPSSatsUsed=GPSSats, BatRecTemperature=Temperature, \
+                BatRecDeviceID=recDeviceID, BatRecDeviceFirmware=recDeviceFirmware, \
+                BatRecTriggerCutOffFreqEff=recDeviceStartFrequency, \
+                BatRecPreTriggerTime=recDevicePreTrigger, BatRecPostTriggerTime=recDevicePostTrigger)
+        for key in values:
+                values[key] = escape(values[key])
+
+        return batScopeRecordTemplate % values
+
+#----------------------------------------------------------------------------------
+def writeBatScopeXml(batScopeXml, fileName, recDeviceName, recDate, recLocationDevice, GPSValid, \
+                                                 GPSLat, GPSLong, GPSAlt, GPSHdop, GPSSats, Temperature, \
+                                                 recDeviceID, recDeviceFirmware, \
+                                                 recDeviceStartFrequency, recDevicePreTrigger, recDevicePostTrigger):        
+        # renders the record and writes it with a single write into a temporary file
+        # renaming it afterwards, so there is never a half written XML file for BatScope
+        returnValue = 0
+        try:
+                record = renderBatScopeXml(fileName, recDeviceName, recDate, recLocationDevice, GPSValid, \
+                        GPSLat, GPSLong, GPSAlt, GPSHdop, GPSSats, Temperature, \
+                        recDeviceID, recDeviceFirmware, \
+                        recDeviceStartFrequency, recDevicePreTrigger, recDevicePostTrigger)
+
+                with open(batScopeXml + '.tmp', 'w', encoding='utf-8') as fXml:
+                        fXml.write(record)
+                os.replace(batScopeXml + '.tmp', batScopeXml)
+                returnValue = 1
+        except:
+                print('Error writing metadate into BatScopeXml file.')
+
+        return returnValue
+
+#----------------------------------------------------------------------------------
+def initRecordingWorker(context):
+
+    # stores the read-only gps fixes, temperature timeline and device settings for processRecording()
+    # called once in every worker process and once for sequential runs
+    global recordingContext
+    recordingContext = context
+
+#----------------------------------------------------------------------------------
+def processRecording(wavFile):
+
+    # finds temperature and geo reference for a single recording and writes its BatScope XML file
+    # recordings do not depend on each other, so this can run in a worker process
+    # returns a dict with the results, which the main program merges in recording order,
+    # written is 0 if the BatScope XML file could not be written
+    context = recordingContext
+
+    theTemperature = getWavFileTemperature(wavFile, context['envLog'])
+
+    currentWav = os.path.basename(wavFile)
+
+    locationDevice = 'gps'
+    gpsValid = 'never'
+    reference = 'none'
+    lat = '0'
+    long = '0'
+    altitude = '0'
+    hdop = '0'
+    sats = '0'
+
+    if context['fixedGeo'] == 1:
+        lat = context['fixedLat']
+        long = context['fixedLong']
+        altitude = context['fixedAltitude']
+        gpsValid = 'old'
+        reference = 'fixed'
+    elif currentWav in context['fixes']:
+        # gps fixes of all recordings are looked up at once by the main program, see joinTrackpoints()
+        lat, long, altitude, hdop, sats = context['fixes'][currentWav]
+        gpsValid = 'yes'
+        reference = 'gps'
+
+    recordValues = (currentWav, context['deviceName'], currentWav[10:18] + currentWav[19:25], locationDevice, gpsValid, \
+            lat, long, altitude, hdop, sats, str(theTemperature), \
+            currentWav[0:7], context['deviceFirmware'], \
+            str(context['startFrequency']), str(context['preTrigger']), str(context['postTrigger']))
+
+    result = dict(wavFile=currentWav, temperature=theTemperature, reference=reference, written=1, \
+        lat=lat, long=long, altitude=altitude, index=list(recordValues[0:3] + ('1',) + recordValues[3:]))
+
+    if context['bundle']:
+        # the main program collects all records into one session file
+        result['record'] = renderBatScopeXml(*recordValues)
+    else:
+        #write metadata to a xml file for each recording
+        fileName, fileExtension=os.path.splitext(currentWav)
+        currentXml = context['batScopePath'] + fileName + '.xml'
+        result['written'] = writeBatScopeXml(currentXml, *recordValues)
+
+    return result
+
+#----------------------------------------------------------------------------------
+def hashInputFiles(inputFiles, settings):
+
+    # builds a hash over all input files shared by the recordings (gpx, ENVLOG.TXT, settings) and the given settings,
+    # a string with time correction and georeference options
+    # if any of them changes, all BatScope XML files have to be rebuilt
+    inputsHash = hashlib.sha1(settings.encode('utf-8'))
+    for inputFile in sorted(inputFiles):
+        if os.path.exists(inputFile):
+            inputsHash.update(os.path.basename(inputFile).encode('utf-8'))
+            with open(inputFile, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    inputsHash.update(block)
+
+    return inputsHash.hexdigest()
+
+#----------------------------------------------------------------------------------
+def readManifest(manifestFile):
+
+    # reads the manifest of recordings processed by earlier runs
+    # returns a dict with the wav file name as key and the manifest columns as values
+    manifest = dict()
+
+    if os.path.exists(manifestFile):
+        with open(manifestFile) as fManifest:
+            columns = fManifest.readline().rstrip('\n').split(';')
+            for line in fManifest:
+                values = line.rstrip('\n').split(';')
+                # an interrupted run may leave an incomplete last line
+                if line.endswith('\n') and len(values) == len(columns):
+                    entry = dict(zip(columns, values))
+                    manifest[entry['WavFile']] = entry
+
+    return manifest
+
+#----------------------------------------------------------------------------------
+def readBatScopeIndex(indexFile):
+
+    # reads the session index of an earlier run
+    # returns a dict with the wav file name as key and the row of the index as value
+    index = dict()
+
+    if os.path.exists(indexFile):
+        with open(indexFile, encoding='utf-8', newline='') as fIndex:
+            rows = csv.reader(fIndex, delimiter=';')
+            if next(rows, None) == list(batScopeIndexFields):
+                for row in rows:
+                    if len(row) == len(batScopeIndexFields):
+                        index[row[0]] = row
+
+    return index
+
+#----------------------------------------------------------------------------------
+def readBatScopeIndexRow(batScopeXml):
+
+    # reads the BatScope XML file of a recording into a row of the session index
+    # returns None if the file can not be read or a field is missing
+    try:
+        values = dict((element.tag, element.text or '') for element in ET.parse(batScopeXml).getroot())
+        return [values[field] for field in batScopeIndexFields]
+    except:
+        return None
+
+#----------------------------------------------------------------------------------
+def writeManifestEntry(fManifest, result, wavEntry, inputsHash):
+
+    # appends one processed recording to the manifest, so an interrupted run can resume from here
+    fManifest.write(result['wavFile'] + ";" + str(wavEntry['size']) + ";" + str(int(wavEntry['mtime'])) + ";" + inputsHash + ";" + \
+        str(result['temperature']) + ";" + result['reference'] + ";" + result['lat'] + ";" + result['long'] + ";" + result['altitude'] + "\n")
+    fManifest.flush()
+
+# ==================================================================================================================
+# Main program
+# ==================================================================================================================
+
+import csv, datetime, getopt, glob, hashlib, multiprocessing, os, sys
+from xml.sax.saxutils import escape
+import xml.etree.ElementTree as ET
+from .batPiCommon import openCsvReport, writeCsvRow, openKmlReport, writeKmlPlacemark, closeReport
+from .batPiCommon import parseWavFileDateTime, readEnvironmentLog, findTemperature, readGpxTrackpoints, joinTrackpoints, epochSeconds, georeferenceModes, \
+    scanWavFiles, isValidRecording, readBatPiSettings
+
+#----------------------------------------------------------------------------------
+def main(argv):
+
+    # runs the script with the command line arguments argv (without the script name)
+
+    # default variables - can be changed by sys.argv ###
+
+    # default base path for all data and bin files
+    # basePath = "/home/fred/projekte/batpi/raw/20160709-tr1/"
+    basePath = os.getcwd() + '/'
+
+    # default UTC time correction in hours for time stamp calculations.
+    # For Germany, set to 1 for bat sounds recorded during winter time, use 2 for sounds recorded during summer
+    utcTimeCorrection = 2           
+
+    # number of worker processes for the recordings, 1 processes all recordings in this process
+    jobs = 1
+
+    # rebuild all BatScope XML files, even if recordings and inputs did not change since the last run
+    rebuild = False
+
+    # write all BatScope records of the session into one file instead of one XML file per recording
+    bundle = False
+
+    # check the RIFF header of every recording and skip recordings without audio data
+    checkWav = False
+
+    # how recordings are matched to gps track points less than gpsTolerance seconds away:
+    # 'window' takes the first track point, 'nearest' the closest one and 'interpolate' a position between
+    # the track points before and after the recording - use nearest or interpolate for tracks logged every 30 seconds
+    gpsMode = 'window'
+    gpsTolerance = 5
+
+    ### parse command line args if any
+    try:    
+        options, arguments = getopt.gnu_getopt(argv, 'j:', ['jobs=', 'rebuild', 'bundle', 'check-wav', 'gps-mode=', 'gps-tolerance='])
+        for option, value in options:
+            if option in ('-j', '--jobs'):
+                jobs = int(value)
+                if jobs < 1:
+                    raise ValueError('Number of jobs must be at least 1.')
+            if option == '--rebuild':
+                rebuild = True
+            if option == '--bundle':
+                # the session file is always written completely
+                bundle = True
+                rebuild = True
+            if option == '--check-wav':
+                checkWav = True
+            if option == '--gps-mode':
+                if value not in georeferenceModes:
+                    raise ValueError('Unknown gps mode: ' + value)
+                gpsMode = value
+            if option == '--gps-tolerance':
+                gpsTolerance = int(value)
+                if gpsTolerance < 1:
+                    raise ValueError('GPS tolerance must be at least 1 second.')
+
+        args = (len(arguments) + 1)
+        if args > 1:    # user passed a base path
+            candidatePath = arguments[0]
+            if not os.path.exists(candidatePath):
+                # maybe user just entered a new sub dir
+                if not os.path.exists(basePath + candidatePath):
+                    print ("Given base path not found. Trying default path.")
+                else:
+                    basePath = basePath + candidatePath + "/"
+            else:
+                basePath = candidatePath + "/"
+
+        if args > 2:    # user passed UTC time correction
+            candidateTimeCorrection = int(arguments[1])
+            if candidateTimeCorrection >=0:
+                utcTimeCorrection = candidateTimeCorrection                
+    except:        
+        print("Invalid command argument. Usage: makeBatScopeXml.py [--jobs N] [--rebuild] [--bundle] [--check-wav] [--gps-mode window|nearest|interpolate] [--gps-tolerance SECONDS] <base path> <UTC time correction>")
+        sys.exit(1)
+
+    print ("Using base path: " + basePath)
+    print ("Using time correction: " + str(utcTimeCorrection))
+    print ("Using jobs: " + str(jobs))
+    print ("Using gps matching: " + gpsMode + ", less than " + str(gpsTolerance) + " seconds")
+    print('----------------------------------------------------------------')
+
+    try:
+        # set input directories 
+        piRawDataPath = basePath + "out/data/"
+        piBinPath  = basePath + "out/bin/"
+        piGpsPath  = basePath + "out/data/gps/"
+
+        # set output directories
+        reportsPath = basePath + "reports/"
+        batScopePath = piRawDataPath + "batscope/"
+
+        # paths for the input files
+        gpxFiles = glob.glob(piGpsPath + "*.gpx")
+        settingsFile = piBinPath + "recordings.sh"
+        environmentFile = basePath + "ENVLOG.TXT"
+
+        # see if base path exist
+        if not os.path.exists(piRawDataPath):
+            print('Sorry, can not find the Bat-Pi raw data input directory:')
+            print(piRawDataPath)
+            print('Hint: you can pass a valid base path by calling ')
+            print (sys.argv[0] +  " <new/base/path>")
+            sys.exit(1)
+
+        if not os.path.exists(piGpsPath):
+            os.makedirs(piGpsPath)
+            print('Can not find the Bat-Pi GPS directory. Check path and try again.')
+            sys.exit(1)
+
+        if not os.path.exists(piBinPath):
+            print('Can not find Bat-Pi bin directory. Check path and try again.')
+            sys.exit(1)
+    except:
+        print("Error accessing Bat-Pi files.")
+        sys.exit(1)
+
+    print ("Bat Pi Version and firmware")
+    print('----------------------------------------------------------------')
+
+    try:
+        # get current Bat Pi parameters, parsed once for all bat nights with the same settings files
+        settings = readBatPiSettings(basePath)[1]
+        deviceName, deviceFirmware, micVersion = settings.deviceName, settings.deviceFirmware, settings.micVersion
+        preTrigger, postTrigger = settings.preTrigger, settings.postTrigger
+        startTreshold, stopTreshold = settings.startTreshold, settings.stopTreshold
+        startFrequency, recordLength, volume = settings.startFrequency, settings.recordLength, settings.volume
+        priority, recbuffer = settings.priority, settings.recbuffer
+
+        # inform user
+        print('Device name     : ' + deviceName)
+        print('Device firmware : ' + str(deviceFirmware))
+    except:
+        print("Error reading Bat Pi settings. Wrong Bat Pi firmware version?")
+        e = sys.exc_info()
+        print(e)
+        sys.exit(1)
+
+    print('----------------------------------------------------------------')
+
+    # inform user
+    print('Mic Version     : ' + str(micVersion))
+    print('Pretrigger      : ' + str(preTrigger) + ' msec')
+    print('Posttrigger     : ' + str(postTrigger) + ' msec')
+    print('Treshold start  : ' + str(startTreshold) + ' %')
+    print('Treshold stop   : ' + str(stopTreshold) + ' %')
+    print('Start frequency : ' + str(startFrequency) + ' Hz')
+    print('Record length   : ' + str(recordLength) + ' sec')
+    print('Record volume   : ' + str(volume))
+    print('Record priority : ' + priority)
+    print('Record buffer   : ' + recbuffer)
+
+    print('----------------------------------------------------------------')
+
+    try:
+        # see if there are valid recordings (wav file is bigger as 1000 bytes)
+        wavNumber=0
+        validWavFiles = list()
+        wavEntries = dict()
+        for wavEntry in scanWavFiles(piRawDataPath, checkWav):
+            if isValidRecording(wavEntry):
+                validWavFiles.append(wavEntry['path'])
+                wavEntries[wavEntry['name']] = wavEntry
+                wavNumber=wavNumber+1
+        print (str(wavNumber) + ' valid wav files.')
+
+        # see if there are GPS data logged (gpx file is bigger as 398 bytes)
+        gpxNumber=0
+        validGpxFiles = list()
+        for index, item in enumerate(gpxFiles):
+            with open(gpxFiles[index]) as gpx:
+                gpx.seek(0, os.SEEK_END)
+                gpxSize=gpx.tell()
+                if gpxSize > 398:
+                    validGpxFiles.append(item)
+                    gpxNumber=gpxNumber+1
+        print (str(gpxNumber) + ' valid gpx files.')
+
+        # parse all track points once into a time sorted index
+        trackIndex = readGpxTrackpoints(validGpxFiles)
+        print (str(len(trackIndex['time'])) + ' gpx track points.')
+
+        # use a simple txt file with fixed geo-reference when it is present
+        fixedGeoFile = piGpsPath + "fixed-geo.txt"
+        fixedGeo = 0
+        if os.path.exists(fixedGeoFile):
+            fixedGeo = 1
+            # read the fixed-geo.txt file
+            with open(fixedGeoFile) as geoFile:
+                for i, line in enumerate(geoFile):
+                    if 'latitude' in line:
+                        pos1=line.find('"')
+                        pos2=line.find('"',pos1+1)
+                        fixedLat=line[pos1+1:pos2]
+                    if 'longitude' in line:
+                        pos1=line.find('"')
+                        pos2=line.find('"',pos1+1)
+                        fixedLong=line[pos1+1:pos2]
+                    if 'altitude' in line:
+                        pos1=line.find('"')
+                        pos2=line.find('"',pos1+1)
+                        fixedAltitude=line[pos1+1:pos2]
+
+            # inform user
+            print('Fixed latitude  : ' + fixedLat)
+            print('Fixed longitude : ' + fixedLong)
+            print('Fixed altitude  : ' + fixedAltitude)
+
+        # see if there is a temperature log
+        if not os.path.exists(environmentFile):
+            print('No ENVLOG.TXT found. Using default temperature of -1000 C.')
+        else:
+            print('ENVLOG.TXT found.')
+
+        # parse the environment log once into a temperature timeline
+        envLog = readEnvironmentLog(environmentFile)
+    except:
+        print("Error reading Bat Pi *.wav or GPS data.")
+        sys.exit(1)
+
+    # if no recordings found, there is nothing to do
+    if wavNumber==0:
+        print('Sorry, no recordings found. Nothing to do here. Bye now.')
+        sys.exit(2)
+
+    try:
+        # create output directoriea if not exist
+        if not os.path.exists(reportsPath):
+            os.makedirs(reportsPath)
+        if not os.path.exists(batScopePath):
+            os.makedirs(batScopePath)
+    except:
+        print("Unexpected error creating output directories.")
+        sys.exit(1)
+
+    print('----------------------------------------------------------------')
+
+    print('Start georeferencing. This may take some time. Please hang on...')
+    print('================================================================')
+
+    notReferenced = list()
+    referenced = list()
+    skippedFiles = 0
+    processedFiles = 0
+    processedFixedFiles = 0
+
+    # recordings without BatScope XML file, the exit code is 1 if there are any
+    failedFiles = 0
+
+    validWavFiles.sort()
+
+    # everything a recording needs is loaded now and shared read-only with the workers
+    context = dict(fixes=dict(), envLog=envLog, \
+        fixedGeo=fixedGeo, fixedLat='', fixedLong='', fixedAltitude='', batScopePath=batScopePath, bundle=bundle, \
+        deviceName=deviceName, deviceFirmware=deviceFirmware, startFrequency=startFrequency, \
+        preTrigger=preTrigger, postTrigger=postTrigger)
+    if fixedGeo == 1:
+        context.update(fixedLat=fixedLat, fixedLong=fixedLong, fixedAltitude=fixedAltitude)
+
+    # find recordings which are unchanged since the last run - their XML files are kept
+    # the manifest is rewritten with those recordings only and then extended while processing
+    manifestFile = reportsPath + 'batscope-manifest.csv'
+    inputsHash = hashInputFiles(validGpxFiles + [environmentFile, settingsFile, fixedGeoFile, \
+        basePath + "etc/batpi/recording.conf"], str(utcTimeCorrection) + ';' + gpsMode + ';' + str(gpsTolerance))
+
+    # the session index lists the BatScope records of all recordings, rows of unchanged recordings are kept
+    indexFile = batScopePath + 'batscope-index.csv'
+
+    manifest = dict()
+    previousIndex = dict()
+    if not rebuild:
+        manifest = readManifest(manifestFile)
+        previousIndex = readBatScopeIndex(indexFile)
+
+    unchanged = dict()
+    pendingWavFiles = list()
+    for wavFile in validWavFiles:
+        currentWav = os.path.basename(wavFile)
+        entry = manifest.get(currentWav)
+        if entry is not None and entry['Size'] == str(wavEntries[currentWav]['size']) \
+                and entry['MTime'] == str(int(wavEntries[currentWav]['mtime'])) and entry['InputsHash'] == inputsHash \
+                and os.path.exists(batScopePath + os.path.splitext(currentWav)[0] + '.xml'):
+            if currentWav not in previousIndex:
+                # an interrupted run left no index, the row is taken from the XML file of the recording
+                indexRow = readBatScopeIndexRow(batScopePath + os.path.splitext(currentWav)[0] + '.xml')
+                if indexRow is None:
+                    pendingWavFiles.append(wavFile)
+                    continue
+                previousIndex[currentWav] = indexRow
+            unchanged[currentWav] = dict(wavFile=currentWav, temperature=entry['Temperature'], reference=entry['Reference'], \
+                lat=entry['Latitude'], long=entry['Longitude'], altitude=entry['Altitude'])
+        else:
+            pendingWavFiles.append(wavFile)
+
+    print(str(len(unchanged)) + ' wav files unchanged since last run, ' + str(len(pendingWavFiles)) + ' wav files to process.')
+
+    fManifestTmp = open(manifestFile + '.tmp', 'w')
+    fManifestTmp.write("WavFile;Size;MTime;InputsHash;Temperature;Reference;Latitude;Longitude;Altitude\n")
+    for currentWav in sorted(unchanged):
+        writeManifestEntry(fManifestTmp, unchanged[currentWav], wavEntries[currentWav], inputsHash)
+    fManifestTmp.close()
+    os.replace(manifestFile + '.tmp', manifestFile)
+    fManifest = open(manifestFile, 'a')
+
+    # the session file is written into a temporary file and renamed when all records are in
+    bundleFile = batScopePath + 'batscope-session.xml'
+    bundleComplete = True
+    if bundle:
+        fBundle = open(bundleFile + '.tmp', 'w', encoding='utf-8', buffering=1024 * 1024)
+        fBundle.write("<BatScopeSession>\n")
+
+    indexReport = openCsvReport(indexFile, batScopeIndexFields)
+
+    pool = None
+    currentWav = os.path.basename(validWavFiles[0])
+    try:
+            # georeference all recordings to process in a single call
+            if fixedGeo == 0 and len(pendingWavFiles) > 0:
+                pendingNames = [os.path.basename(wavFile) for wavFile in pendingWavFiles]
+                utcTimes = [epochSeconds(parseWavFileDateTime(name)['wavDateTime'] - datetime.timedelta(hours=utcTimeCorrection)) \
+                    for name in pendingNames]
+                fixes = joinTrackpoints(trackIndex, utcTimes, gpsTolerance, gpsMode)
+                for index, name in enumerate(pendingNames):
+                    if fixes['found'][index]:
+                        context['fixes'][name] = ('%.6f' % fixes['lat'][index], '%.6f' % fixes['long'][index], \
+                            '%.6f' % fixes['altitude'][index], '%.1f' % fixes['hdop'][index], str(fixes['sats'][index]))
+
+            if jobs > 1 and len(pendingWavFiles) > 0:
+                try:
+                    # workers inherit the loaded data from this process, this needs the fork start method
+                    pool = multiprocessing.get_context('fork').Pool(jobs, initRecordingWorker, (context,))
+                    results = pool.imap(processRecording, pendingWavFiles, 16)
+                except ValueError:
+                    print('Parallel processing is not available on this system. Using a single job.')
+            if pool is None:
+                initRecordingWorker(context)
+                results = map(processRecording, pendingWavFiles)
+
+            # results arrive in recording order, so reports are the same for any number of jobs
+            for wavFile in validWavFiles:
+
+                currentWav = os.path.basename(wavFile)
+                if currentWav in unchanged:
+                    result = unchanged[currentWav]
+                    writeCsvRow(indexReport, previousIndex[currentWav])
+                    print (currentWav + ": " + str(result['temperature']) + " degrees C, unchanged.")
+                else:
+                    result = next(results)
+                    if result['written'] == 0:
+                        # no index row and no manifest entry, the next run processes it again
+                        failedFiles = failedFiles + 1
+                        print (currentWav + ": " + str(result['temperature']) + " degrees C, FAILED.")
+                        continue
+                    if bundle:
+                        fBundle.write(result['record'])
+                    writeCsvRow(indexReport, result['index'])
+                    writeManifestEntry(fManifest, result, wavEntries[currentWav], inputsHash)
+                    print (currentWav + ": " + str(result['temperature']) + " degrees C, processed.")
+
+                if result['reference'] == 'fixed':
+                    processedFixedFiles = processedFixedFiles+1
+                elif result['reference'] == 'gps':
+                    processedFiles=processedFiles+1
+                    referenced.append([currentWav,result['lat'],result['long'],result['altitude']])
+                else:
+                    skippedFiles = skippedFiles + 1
+                    notReferenced.append(currentWav)
+
+    except:
+            print('Error georeferencing recording files.')
+            bundleComplete = False
+            failedFiles = failedFiles + 1
+
+    fManifest.close()
+
+    # an incomplete index is fine, the importer reads the XML file of recordings missing in the index
+    # and the next run processes them again
+    closeReport(indexReport)
+    print("BatScope session index: " + indexFile)
+
+    if bundle:
+            fBundle.write("</BatScopeSession>\n")
+            fBundle.close()
+            # keep an existing session file if this run did not get through all recordings
+            if bundleComplete:
+                os.replace(bundleFile + '.tmp', bundleFile)
+                print("BatScope session file: " + bundleFile)
+    if pool is not None:
+            pool.close()
+            pool.join()
+
+    wavFileDateElements = parseWavFileDateTime(currentWav)
+    fileName, fileExtension=os.path.splitext(currentWav)
+
+    print('----------------------------------------------------------------')
+    print(str(processedFixedFiles) + ' wav files georeferenced using FIXED coordinates. ')
+    print(str(processedFiles) + ' wav files georeferenced using GPX data. ')
+    print(str(skippedFiles) + ' wav files could NOT be georeferenced: ')
+    if failedFiles > 0:
+        print('Errors writing BatScope XML files, run again to process the failed wav files.')
+    print('----------------------------------------------------------------')
+
+    if skippedFiles > 0:
+            print('Files without geo reference: ')
+            for skipped in notReferenced:
+                print(skipped)
+            print('----------------------------------------------------------------')
+
+    wavDateTime = wavFileDateElements['wavDateTime']
+
+    # now build a kml file from mulidimensional array with referenced files
+    try:
+            if gpxNumber!=0:
+                if fileName != "":
+                    currentKml = reportsPath + 'pi-route.kml'
+
+                    kmlReport = openKmlReport(currentKml, currentKml)
+                    for geoPoint in referenced:
+                        writeKmlPlacemark(kmlReport, geoPoint[0], str(wavDateTime), geoPoint[1], geoPoint[2], geoPoint[3])
+                    closeReport(kmlReport)
+                    print("KML file: " + currentKml)
+                    print('----------------------------------------------------------------')
+    except:
+            print('Error building pi-route.kml file.')
+
+    # summarize and archive pi settings for this export session
+    try:
+            fPiXml = open(reportsPath + 'pi-session.xml', 'w')
+            fPiXml.write("<PiSession>\n")
+            fPiXml.write("   <BatPiDevice>" + currentWav[0:7] + "</BatPiDevice>\n")
+            fPiXml.write("   <DateTime>" + str(wavDateTime) + "</DateTime>\n")
+            fPiXml.write("   <Recordings>" + str(processedFiles) + "</Recordings>\n")
+            fPiXml.write("   <FixedGeoPosition>" + str(fixedGeo) + "</FixedGeoPosition>\n")
+            fPiXml.write("   <PreTrigger>" + str(preTrigger) + " msec</PreTrigger>\n")
+            fPiXml.write("   <PostTrigger>" + str(postTrigger) + " msec</PostTrigger>\n")
+            fPiXml.write("   <StartTreshold>" + str(startTreshold) + " %</StartTreshold>\n")
+            fPiXml.write("   <StopTreshold>" + str(stopTreshold) + " %</StopTreshold>\n")
+            fPiXml.write("   <StartFrequency>" + str(startFrequency) + " Hz</StartFrequency>\n")
+            fPiXml.write("   <RecordLength>" + str(recordLength) + " sec</RecordLength>\n")
+            fPiXml.write("   <RecordVolumeLevel>" + str(volume) + "</RecordVolumeLevel>\n")
+            fPiXml.write("   <RecordPriority>" + priority + "</RecordPriority>\n")
+            fPiXml.write("   <RecordBuffer>" + recbuffer + "</RecordBuffer>\n")
+            fPiXml.write("</PiSession>\n")
+            fPiXml.close()
+    except:
+            print('Error writing pi-session.xml file.')
+
+    # create csv file with same data
+    try:
+            outputCsv = reportsPath + 'pi-session.csv'
+            csvReport = openCsvReport(outputCsv, "DateTime;BatPiDevice;Recordings;FixedGeoPosition;PreTrigger;PostTrigger;StartTreshold;StopTreshold;StartFrequency;RecordLength;RecordVolumeLevel;RecordPriority;RecordBuffer".split(';'))
+            writeCsvRow(csvReport, [wavDateTime, currentWav[0:7], processedFiles, fixedGeo, preTrigger, postTrigger, startTreshold, stopTreshold, startFrequency, recordLength, volume, priority, recbuffer])
+            closeReport(csvReport)
+    except:
+            print('Error writing pi-session.csv file.')
+
+    # create the log file
+    try:
+            outputLog = reportsPath + 'session-georeference.log'
+            fLog = open(outputLog, 'w')
+            fLog.write(str(datetime.datetime.now()) + " log created by makeBatScopeXml.py \n")
+            fLog.write('----------------------------------------------------------------\n')
+            fLog.write (str(wavNumber) + ' valid wav files.\n')
+            fLog.write (str(gpxNumber) + ' valid gpx files.\n')
+            if not os.path.exists(environmentFile):
+                    fLog.write('No ENVLOG.TXT found. Using default temperature of -1000 C.\n')
+            else:
+                    fLog.write('ENVLOG.TXT found.\n')
+
+            if os.path.exists(fixedGeoFile):
+                    fLog.write('fixed-geo.txt found:\n')
+                    fLog.write('  ---> fixed latitude  : ' + fixedLat + '\n')
+                    fLog.write('  ---> fixed longitude : ' + fixedLong + '\n')
+                    fLog.write('  ---> fixed altitude  : ' + fixedAltitude + '\n')
+            fLog.write('----------------------------------------------------------------\n')
+            fLog.write ("Bat Pi device settings\n")
+            fLog.write('----------------------------------------------------------------\n')
+            fLog.write('Device name     : ' + deviceName + "\n")
+            fLog.write('Device firmware : ' + str(deviceFirmware) + "\n")
+            fLog.write('Mic Version     : ' + str(micVersion) + "\n")
+            fLog.write('Pretrigger      : ' + str(preTrigger) + ' msec\n')
+            fLog.write('Posttrigger     : ' + str(postTrigger) + ' msec\n')
+            fLog.write('Treshold start  : ' + str(startTreshold) + ' %\n')
+            fLog.write('Treshold stop   : ' + str(stopTreshold) + ' %\n')
+            fLog.write('Start frequency : ' + str(startFrequency) + ' Hz\n')
+            fLog.write('Record length   : ' + str(recordLength) + ' sec\n')
+            fLog.write('Record volume   : ' + str(volume) + "\n")
+            fLog.write('Record priority : ' + priority + "\n")
+            fLog.write('Record buffer   : ' + recbuffer + "\n")
+            fLog.write('----------------------------------------------------------------\n')
+            fLog.write(str(processedFixedFiles) + ' wav files georeferenced using FIXED coordinates.\n')
+            fLog.write(str(processedFiles) + ' wav files georeferenced using GPX data.\n')
+            fLog.write(str(skippedFiles) + ' wav files could NOT be georeferenced:\n')
+            fLog.write('----------------------------------------------------------------\n')
+
+            if skippedFiles > 0:
+                    fLog.write('Files without geo reference:\n')
+                    for skipped in notReferenced:
+                        fLog.write("  " + skipped + "\n")
+                    fLog.write('----------------------------------------------------------------\n')
+
+            fLog.close()
+    except:
+            e = sys.exc_info()
+            print(e)
+            print('Error writingsession-georeference.log file.')
+
+
+    print('Pi settings for this export archived in : ')
+    print(reportsPath + 'pi-session.xml')
+    print('----------------------------------------------------------------')
+    print('All done. Bye now.')
+
+    if failedFiles > 0:
+        sys.exit(1)
+
+#----------------------------------------------------------------------------------
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,301 @@
+#!/usr/lib/python3.2
+
+# General description:
+# Processes a whole field campaign of Bat-Pi devices in one run, e.g. as a scheduled job.
+# All Bat-Pi dumps (directories with an out/data directory) below a root directory are prepared with
+# makeBatNightDirectories.py and each of their bat nights is georeferenced with makeBatScopeXml.py.
+# The script serves a bat survey as part of a fauna, flora and habitat monitoring project
+# Organisation: BI Rettet den Wollenberg e.V. see http://bi-wollenberg.org/ (German site)
+# Author      : FVG - ffhmonitor@gmail.com
+
+# Script actions in detail:
+# - it finds all Bat-Pi dumps below the root directory, sites already prepared (with a SITE.TXT) are left alone
+# - the site name of a dump is the name of its directory, e.g. <root>/2017-06/wollenberg-nord/out/data
+#   becomes the site wollenberg-nord with a bat night directory wollenberg-nord/20170612 in the dump's directory
+# - it runs the bat night splitting of all dumps in a pool of worker processes
+# - it then writes the BatScope XML files of all bat nights in a pool of worker processes
+# - gps tracks used by more than one bat night are parsed once before the workers start, devices that used the
+#   same gps logger share the parsed track instead of reading the same gpx file for every bat night, all other
+#   tracks are parsed by the workers
+# - every dump is processed in its own worker process, so a broken dump does not stop the others, its output goes
+#   to a log in batpi-campaign-logs/ in the root directory, e.g. 2017-06_wollenberg-nord.log - a log in the dump's
+#   directory would be moved into the site directory by makeBatNightDirectories.py while it is written
+# - every bat night has a log of its own, e.g. 2017-06_wollenberg-nord-20170612.log
+# - a dump with an interrupted run (a .batnights-journal) is skipped, resume or roll it back first
+# - it prints a summary of all dumps at the end, the exit code is 1 if any dump failed
+# - it writes the device settings of all bat nights into batpi-campaign-settings.csv in the root directory
+
+# Usage: python3 -m batpi campaign [--jobs N] [--utc N] [--link MODE] [--slice] [--dry-run] <root directory>
+# This file is on GitHub: https://github.com/ffhmon/bat-project/batpi/processCampaign.py
+# Licence: GNU General Public Licence v3
+
+# Script history:
+# Version 1.0 - October 17, 2026 - initial commit
+#   - device settings of all bat nights are collected into batpi-campaign-settings.csv, read from the settings cache
+
+#----------------------------------------------------------------------------------
+def findBatPiDumps(rootPath):
+
+    # returns the paths of all Bat-Pi dumps below rootPath, sorted
+    # a dump is a directory with an out/data directory, its sub directories are not searched
+    # directories with a SITE.TXT are prepared sites (or bat nights) and are not searched either
+    dumps = list()
+    for directory, subDirectories, fileNames in os.walk(rootPath):
+        if 'SITE.TXT' in fileNames:
+            subDirectories[:] = []
+        elif os.path.isdir(os.path.join(directory, 'out', 'data')):
+            dumps.append(os.path.join(directory, ''))
+            subDirectories[:] = []
+        else:
+            subDirectories.sort()
+    return sorted(dumps)
+
+#----------------------------------------------------------------------------------
+def findBatNights(sitePath):
+
+    # returns the paths of the bat night directories (YYYYMMDD) of a prepared site, sorted
+    nights = list()
+    if os.path.isdir(sitePath):
+        for name in sorted(os.listdir(sitePath)):
+            if len(name) == 8 and name.isdigit() and os.path.isdir(sitePath + name + '/out/data'):
+                nights.append(sitePath + name + '/')
+    return nights
+
+#----------------------------------------------------------------------------------
+def findValidGpxFiles(basePath):
+
+    # returns the gpx files of a Bat-Pi directory, which makeBatScopeXml.py uses (gpx file is bigger as 398 bytes)
+    # in the same order, so both find the same parsed track
+    return [item for item in glob.glob(basePath + 'out/data/gps/*.gpx') if os.path.getsize(item) > 398]
+
+#----------------------------------------------------------------------------------
+def campaignLogFile(rootPath, dumpPath, nightName=''):
+
+    # returns the log file of a dump, the path of the dump below rootPath with / replaced by _
+    # bat nights of a dump run at the same time, each gets its own log file, e.g. 2017-06_wollenberg-nord-20170612.log
+    relativePath = os.path.relpath(dumpPath, rootPath)
+    if relativePath == '.':
+        relativePath = os.path.basename(os.path.dirname(dumpPath))
+    if nightName != '':
+        relativePath += '-' + nightName
+    return os.path.join(rootPath, campaignLogDirectory, relativePath.replace(os.sep, '_') + '.log')
+
+#----------------------------------------------------------------------------------
+def runIsolated(logFile, command, argv, workingDirectory=None):
+
+    # runs a batpi command in a worker process with its output appended to logFile, returns the exit code
+    with open(logFile, 'a') as fLog:
+        stdout = sys.stdout
+        sys.stdout = fLog
+        try:
+            print('==== ' + command + ' ' + ' '.join(argv))
+            exitCode = runCommand(command, argv, workingDirectory)
+        except:
+            print('Unexpected error: ' + str(sys.exc_info()[1]))
+            exitCode = 1
+        finally:
+            sys.stdout.flush()
+            sys.stdout = stdout
+    return exitCode
+
+#----------------------------------------------------------------------------------
+def processDump(task):
+
+    # prepares the bat nights of one dump, runs in a worker process
+    # returns a summary dict of the dump
+    dumpPath, logFile, nightOptions = task
+    siteName = os.path.basename(os.path.dirname(dumpPath))
+    summary = dict(dump=dumpPath, site=siteName, log=logFile, status='', nights=0, failed=0)
+
+    if os.path.exists(dumpPath + '.batnights-journal'):
+        summary['status'] = 'interrupted, run nights --resume or --rollback'
+        return summary
+
+    exitCode = runIsolated(logFile, 'nights', nightOptions + [siteName], dumpPath)
+    if exitCode == 2:
+        summary['status'] = 'no recordings'
+    elif exitCode != 0:
+        summary['status'] = 'failed, see ' + os.path.basename(logFile)
+    else:
+        summary['status'] = 'ok'
+    return summary
+
+#----------------------------------------------------------------------------------
+def processNight(task):
+
+    # writes the BatScope XML files of one bat night, runs in a worker process
+    # makeBatScopeXml.py runs with one job, worker processes can not start workers of their own
+    nightPath, logFile, utcTimeCorrection = task
+    return runIsolated(logFile, 'batscope-xml', [nightPath.rstrip('/'), str(utcTimeCorrection)])
+
+# ==================================================================================================================
+# Main program
+# ==================================================================================================================
+
+import collections, getopt, glob, multiprocessing, os, sys
+from .batPiCommon import hashFileContent, gpxTrackCache, readGpxTrackpoints, readBatPiSettings, BatPiSettings, openCsvReport, writeCsvRow, closeReport
+from .cli import runCommand
+
+# directory of the log files of the dumps, in the root directory
+campaignLogDirectory = 'batpi-campaign-logs'
+
+# name of the report with the device settings of all bat nights, written into the root directory
+campaignSettingsName = 'batpi-campaign-settings.csv'
+
+def main(argv):
+
+    # runs the script with the command line arguments argv (without the script name)
+
+    # default variables - can be changed by sys.argv ###
+
+    # number of worker processes, each processes one dump or one bat night at a time
+    jobs = multiprocessing.cpu_count()
+
+    # UTC time correction in hours, passed to both scripts
+    # For Germany, set to 1 for bat sounds recorded during winter time, use 2 for sounds recorded during summer
+    utcTimeCorrection = 2
+
+    # options passed to makeBatNightDirectories.py
+    linkMode = 'copy'
+    sliceNights = False
+
+    # only list the dumps and sites found, do not process anything
+    dryRun = False
+
+    ### parse command line args
+    try:
+        options, arguments = getopt.gnu_getopt(argv, 'nj:', ['jobs=', 'utc=', 'link=', 'slice', 'dry-run'])
+        for option, value in options:
+            if option in ('-j', '--jobs'):
+                jobs = int(value)
+                if jobs < 1:
+                    raise ValueError('Number of jobs must be at least 1.')
+            if option == '--utc':
+                utcTimeCorrection = int(value)
+            if option == '--link':
+                if value not in ('copy', 'hardlink', 'reflink', 'symlink'):
+                    raise ValueError('Unknown link mode: ' + value)
+                linkMode = value
+            if option == '--slice':
+                sliceNights = True
+            if option in ('-n', '--dry-run'):
+                dryRun = True
+
+        if len(arguments) != 1:
+            raise ValueError('Missing root directory argument.')
+        rootPath = os.path.abspath(arguments[0])
+        if not os.path.isdir(rootPath):
+            raise ValueError('Root directory not found: ' + rootPath)
+
+    except Exception as error:
+        print("Invalid command arguments. Usage: processCampaign.py [--jobs N] [--utc N] [--link copy|hardlink|reflink|symlink] [--slice] [--dry-run] <root directory>")
+        print(error)
+        sys.exit(1)
+
+    print ("Root path: " + rootPath)
+    print ("Using jobs: " + str(jobs))
+    print('----------------------------------------------------------------')
+
+    dumps = findBatPiDumps(rootPath)
+    print (str(len(dumps)) + ' Bat-Pi dumps found.')
+    for dumpPath in dumps:
+        print('   ' + os.path.relpath(dumpPath, rootPath) + ' --> site ' + os.path.basename(os.path.dirname(dumpPath)))
+    print('----------------------------------------------------------------')
+
+    if dryRun:
+        print('Dry run, nothing processed. Bye now.')
+        sys.exit(0)
+
+    if len(dumps) == 0:
+        print('Sorry, no Bat-Pi dumps found. Nothing to do here. Bye now.')
+        sys.exit(2)
+
+    nightOptions = ['--utc', str(utcTimeCorrection), '--link', linkMode]
+    if sliceNights:
+        nightOptions.append('--slice')
+
+    logPath = os.path.join(rootPath, campaignLogDirectory)
+    if not os.path.exists(logPath):
+        os.makedirs(logPath)
+
+    # every task runs in a fresh worker process, no state of one dump is left over for the next
+    # the fork start method is needed, the workers of the bat nights inherit the parsed gps tracks
+    print('Preparing bat nights...')
+    pool = multiprocessing.get_context('fork').Pool(jobs, maxtasksperchild=1)
+    try:
+        summaries = pool.map(processDump, [(dumpPath, campaignLogFile(rootPath, dumpPath), nightOptions) for dumpPath in dumps], 1)
+    finally:
+        pool.close()
+        pool.join()
+
+    # read the device settings of all bat nights and parse the gps tracks shared by several bat nights (same device
+    # or same gps logger) before the workers are started, the workers inherit them and copies are only parsed once
+    # tracks of a single bat night are left to the workers, so they are parsed in parallel
+    nightTasks = list()
+    nightSummaries = list()
+    nightSettings = list()
+    nightTracks = list()
+    for summary in summaries:
+        if summary['status'] != 'ok':
+            continue
+        for nightPath in findBatNights(summary['dump'] + summary['site'] + '/'):
+            try:
+                gpxFiles = findValidGpxFiles(nightPath)
+                nightTracks.append((tuple(hashFileContent(currentGpx) for currentGpx in gpxFiles), gpxFiles))
+            except:
+                pass    # the worker reports unreadable gpx files in the log of the bat night
+            try:
+                nightSettings.append((summary['site'], os.path.basename(nightPath.rstrip('/'))) + readBatPiSettings(nightPath))
+            except:
+                pass    # unknown firmware, reported by the worker as well
+            nightTasks.append((nightPath, campaignLogFile(rootPath, summary['dump'], os.path.basename(nightPath.rstrip('/'))), utcTimeCorrection))
+            nightSummaries.append(summary)
+
+    trackNights = collections.Counter(trackKey for trackKey, gpxFiles in nightTracks)
+    for trackKey, gpxFiles in nightTracks:
+        if trackNights[trackKey] > 1 and trackKey not in gpxTrackCache:
+            try:
+                readGpxTrackpoints(gpxFiles)
+            except:
+                pass    # the worker reports broken gpx files in the log of the bat night
+
+    print('Writing BatScope XML files of ' + str(len(nightTasks)) + ' bat nights...')
+    pool = multiprocessing.get_context('fork').Pool(jobs, maxtasksperchild=1)
+    try:
+        exitCodes = pool.map(processNight, nightTasks, 1)
+    finally:
+        pool.close()
+        pool.join()
+
+    for summary, exitCode in zip(nightSummaries, exitCodes):
+        summary['nights'] += 1
+        if exitCode not in (0, 2):
+            summary['failed'] += 1
+
+    # one row with the device settings for each bat night of the campaign
+    settingsReport = openCsvReport(os.path.join(rootPath, campaignSettingsName), ['Site', 'Night', 'SettingsKey'] + list(BatPiSettings._fields))
+    for site, night, settingsKey, settings in nightSettings:
+        writeCsvRow(settingsReport, [site, night, settingsKey] + list(settings))
+    closeReport(settingsReport)
+
+    # inform user
+    print('----------------------------------------------------------------')
+    failedDumps = 0
+    for summary in summaries:
+        if summary['failed'] > 0:
+            summary['status'] = 'failed ' + str(summary['failed']) + ' bat nights, see the logs of the bat nights'
+        if summary['status'] not in ('ok', 'no recordings'):
+            failedDumps += 1
+        print(summary['site'].ljust(24) + str(summary['nights']).rjust(4) + ' bat nights   ' + summary['status'])
+    print('----------------------------------------------------------------')
+    print(str(len(summaries)) + ' dumps processed, ' + str(failedDumps) + ' with errors.')
+    print(str(len(set(row[2] for row in nightSettings))) + ' different device settings, see ' + campaignSettingsName)
+    print('Logs: ' + logPath)
+    print('All done. Bye now.')
+
+    if failedDumps > 0:
+        sys.exit(1)
+
+#----------------------------------------------------------------------------------
+if __name__ == '__main__':
+    main(sys.argv[1:])
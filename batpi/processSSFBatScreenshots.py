@@ -0,0 +1,418 @@
+#!/usr/lib/python3.2
+
+#-------------------------------------------------------------------------------------
+# Script for processing screenshot (BMP) files from a SSF BAT3 detector
+# (See http://www.mekv.de/bat3/index.htm for information on the bat detector)
+# What the script does:
+# - renames BMP files to meaningfull YYYYMMDD-HHmmss names
+# - converts BMP format to valid JPG files and sets EXIF data to correct picture time stamp
+# - optionally the script can use a temperature / humidity data logger file 
+# - the script can use GPX files and use them for georeferencing 
+#   The code was written for GPX files from a Bat Pi recorder
+#   GPX from other devices may work as well but the code might need some adaptation
+#   For more information on the Raspberry Pi Bat Project please refer to
+#   http://www.fledermausschutz.de/forschen/fledermausrufe-aufnehmen/raspberry-pi-bat-project/
+#-------------------------------------------------------------------------------------
+
+
+#-------------------------------------------------------------------------------------
+# runs on Linux only!
+# - since file time stamps are not correctly processed with Python on Windows
+# - there are dependencies on ImageMagick and ExifTools Packages
+#-------------------------------------------------------------------------------------
+
+
+#-------------------------------------------------------------------------------------
+# optional script parameter: base path for all input files. valid paths can be:
+# - a subdirectory name of the working directory
+# - or a full path on the system
+#-------------------------------------------------------------------------------------
+
+
+#-------------------------------------------------------------------------------------
+# the script expects directory structure, please make sure that this directories exist:
+# <base path>/detector      <--- contains input BMP files from SSF BAT3 (e.g. SCREEN0.BMP etc)
+# <base path>/out/data/gps  <--- contains input GPX files from a Bat Pi recorder
+#-------------------------------------------------------------------------------------
+
+
+#-------------------------------------------------------------------------------------
+# the script expects following clear text files
+#
+#
+# <base path>/ENVLOG.TXT    <--- environment log file from a data logger
+# (our data logger is an Arduino Device logging temperature and humidity every 10 minutes)
+# Example data format (Date; Time; Temperature; Humidity) :
+#    23.9.2016;18:30;21.00;43.00
+#    23.9.2016;18:40;22.00;41.00
+#
+# <base path>/detector/ssf3.txt      <--- archives base settings of a SSF3 Bat bat detector
+# Example data format - change it to reflect actual settings during bat session
+#   Make:microelectronic Volkmann
+#   Detector:SSF BAT3
+#   FirmwareVer:0.99
+#   FirmwareRev:01
+#   Serial:121600239
+#   Speaker Boost:1
+#   Squelch:2
+#   Line out:+0
+#   Display Light:7
+#   Display Dim:1
+#   Eco:30 min
+#   Wake:Bat+Key
+#   AutoOff:60
+#   AutoBat:Fast
+#   Level:7
+#-------------------------------------------------------------------------------------
+
+
+#-------------------------------------------------------------------------------------
+# tasks performed:
+# - Read correct screenshot time stamps 
+# - Convert BMP file format to JPG file format
+# - write EXIF data and correct time stamps to the JPG files
+# - georeference screenshots using the gpx file from a Raspberry Pi Bat Recorder
+# - read logged temperature / humidity values with timestamp from a ENVLOG.TXT file
+#   Format: D.M.Y;H:MM;T;H
+# - write a CSV file with georeferenced screenshots and temperatures 
+# - write a KML file with georeferenced screenshots for later use within QGIS 
+#-------------------------------------------------------------------------------------
+
+
+#-------------------------------------------------------------------------------------
+# Author Fred Van Gestel, BI Rettet den Wollenberg e.V.
+# Version 1.2
+# 18 October 2016
+# Version 1.3 - 17 October 2026: BMP files are converted and EXIF tags written in batches,
+# by a few mogrify and exiftool processes running in parallel instead of six processes per screenshot
+# moved into the batpi package, the main program is the function main(argv),
+# run by processSSFBatScreenshots.py or by python3 -m batpi ssf-screenshots
+# BMP files are only deleted after they were converted
+# Licence: GNU General Public Licence
+#-------------------------------------------------------------------------------------
+
+import datetime, glob, multiprocessing, os, subprocess, sys, getopt, time
+from concurrent.futures import ThreadPoolExecutor
+from .batPiCommon import openCsvReport, writeCsvRow, openKmlReport, writeKmlPlacemark, closeReport
+from .batPiCommon import readEnvironmentLog, findTemperature, readGpxTrackpoints, joinTrackpoints, epochSeconds
+
+# function - gets original file time stamp (linux only)
+def modification_date(filename):
+    t = os.path.getmtime(filename)
+    return datetime.datetime.fromtimestamp(t)
+
+#-------------------------------------------------------------------------------------
+# function - splits a list into at most jobs parts of about the same size
+def splitJobs(items, jobs):
+    return [items[i::jobs] for i in range(jobs) if len(items[i::jobs]) > 0]
+
+#-------------------------------------------------------------------------------------
+# function - converts BMP files to JPG files in the same directory (needs ImageMagick)
+# the files are split on a few workers, each running a single mogrify command for all its files
+# returns False if a mogrify command failed
+def convertBmpFiles(bmpFiles, jobs):
+    def runMogrify(chunk):
+        return subprocess.call(['mogrify', '-format', 'jpg'] + chunk)
+
+    with ThreadPoolExecutor(jobs) as executor:
+        results = list(executor.map(runMogrify, splitJobs(bmpFiles, jobs)))
+    return all(result == 0 for result in results)
+
+#-------------------------------------------------------------------------------------
+# function - writes EXIF tags into JPG files (needs exiftool)
+# jpgTags is a list of (jpg file, list of tag arguments like '-artist=...')
+# each worker starts one exiftool session (-stay_open) and passes all its files as an argument file on stdin,
+# one command per file, so no shell quoting is needed and exiftool starts only once per worker
+# returns False if an exiftool session failed
+def writeExifTags(jpgTags, jobs):
+    def runExiftool(chunk):
+        argumentLines = list()
+        for jpgFile, tags in chunk:
+            argumentLines.extend(tags)
+            argumentLines.extend(['-overwrite_original', jpgFile, '-execute'])
+        argumentLines.extend(['-stay_open', 'False', ''])
+        session = subprocess.Popen(['exiftool', '-stay_open', 'True', '-@', '-'], \
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, errors = session.communicate('\n'.join(argumentLines).encode('utf-8'))
+        if len(errors) > 0:
+            print(errors.decode('utf-8', 'replace').strip())
+        return session.returncode
+
+    with ThreadPoolExecutor(jobs) as executor:
+        results = list(executor.map(runExiftool, splitJobs(jpgTags, jobs)))
+    return all(result == 0 for result in results)
+
+#-------------------------------------------------------------------------------------
+# Important: set following parameters as required
+#-------------------------------------------------------------------------------------
+
+# set general EXIF data as required
+exifCopyright = "CC BY-NC (Creative Commons Attribution-NonCommercial license)"
+exifArtist ="BI Rettet den Wollenberg e.V."
+
+# set UTC time correction in hours for time calculation from UTC. 
+# For Germany, set this to 1 during winter time, 2 during summer time
+utcTimeCorrection = 2
+
+# number of mogrify and exiftool processes converting screenshots at the same time
+conversionJobs = multiprocessing.cpu_count()
+
+# how screenshots are matched to gps track points less than gpsTolerance seconds away:
+# 'window' takes the first track point, 'nearest' the closest one and 'interpolate' a position between
+# the track points before and after the screenshot
+gpsMode = 'window'
+gpsTolerance = 5
+
+#----------------------------------------------------------------------------------
+def main(argv):
+
+    # runs the script with the command line arguments argv (without the script name)
+
+    # default base path for raw input data files used
+    # change this to your own 
+    basePath = os.getcwd() + '/'
+
+    #-------------------------------------------------------------------------------------
+
+    # check if user passed his own new base path
+    args = (len(argv) + 1)
+    if args > 1:
+        candidatePath = argv[0]
+        if not os.path.exists(candidatePath):
+            # maybe user just entered a new sub dir
+            if not os.path.exists(basePath + candidatePath):
+                print ("Given base path not found. Trying default path.")
+            else:
+                basePath = basePath + candidatePath + "/"
+        else:
+            basePath = candidatePath + "/"
+
+    print ("Using base path: " + basePath)
+
+    # set working directories 
+    baseDataPath = basePath + "detector/"
+    baseGpsPath  = basePath + "out/data/gps/"
+    outputPath = basePath + "reports/"
+
+    # paths for the input files
+    bmpFiles = glob.glob(baseDataPath + "*.*")
+    gpxFiles = glob.glob(baseGpsPath + "*.gpx")
+    settingsFile = baseDataPath + "ssf3.txt"
+    environmentFile = basePath + "ENVLOG.TXT"
+
+
+
+    # see if all paths exist
+    if not os.path.exists(baseDataPath):
+        print('Sorry, can not find data directory. Check base path and try again.')
+        print('Hint: you can pass a valid base path by calling ')
+        print (sys.argv[0] +  " <new/base/path>")
+        sys.exit()
+
+    if not os.path.exists(baseGpsPath):
+        print('Sorry, can not find GPS directory. Check path and try again.')
+        sys.exit()
+
+    if not os.path.exists(settingsFile):
+        print('Sorry, can not find SSF3 Detector settings. Check path and try again.')
+        sys.exit()
+
+    # seems like everything's ok -
+    # create output directory if it does not exist
+    if not os.path.exists(outputPath):
+        os.makedirs(outputPath)
+
+    # and create an new empty output file with headers in it
+    outputCsv = outputPath + 'detector.csv'
+    csvReport = openCsvReport(outputCsv, "ScreenshotDate;ScreenshotTime;JpgFileName;Temperature;Latitude;Longitude;Altitude;HDOP;detectorType;detectorFirmware;detectorFirmwareRev;detectorSerial;detectorAutoBat;detectorLevel".split(';'))
+
+    # get current SSF3 settings
+    with open(settingsFile) as batDetector:
+        for i, line in enumerate(batDetector):
+            pos1=line.find(':')+1
+            pos2=len(line)-1
+            if 'Make' in line:            
+                detectorMake = line[pos1:pos2]
+            if 'Detector' in line:            
+                detectorType = line[pos1:pos2]
+            if 'FirmwareVer' in line:
+                detectorFirmware = line[pos1:pos2]
+            if 'FirmwareRev' in line:
+                detectorFirmwareRev = line[pos1:pos2]
+            if 'Serial' in line:
+                detectorSerial = line[pos1:pos2]
+            if 'AutoBat' in line:
+                detectorAutoBat = line[pos1:pos2]
+            if 'Level' in line:
+                detectorLevel = line[pos1:pos2]
+
+    # and inform user 
+    print(detectorType + " v" + detectorFirmware + " Rev" + detectorFirmwareRev + " SN:" + detectorSerial)
+    print('---------------------------------------')
+
+    # see if there are valid bitmap files (file is bigger as 1000 bytes and contains the bmp string)
+    bmpNumber=0
+    validBmpFiles = list()
+    for index, item in enumerate(bmpFiles):
+        with open(bmpFiles[index]) as bmp:
+            bmp.seek(0, os.SEEK_END)
+            bmpSize=bmp.tell()
+            if bmpSize > 1000:
+                if ".bmp" in bmpFiles[index].lower() :
+                    validBmpFiles.append(item)
+                    bmpNumber=bmpNumber+1                
+    print (str(bmpNumber) + ' valid bmp file(s).')
+
+    # see if there are GPS data logged (gpx file is bigger as 398 bytes)
+    gpxNumber=0
+    validGpxFiles = list()
+    for index, item in enumerate(gpxFiles):
+        with open(gpxFiles[index]) as gpx:
+            gpx.seek(0, os.SEEK_END)
+            gpxSize=gpx.tell()
+            if gpxSize > 398:
+                validGpxFiles.append(item)
+                gpxNumber=gpxNumber+1            
+    print (str(gpxNumber) + ' valid gpx file(s).')
+
+    # parse all track points once into a time sorted index
+    trackIndex = readGpxTrackpoints(validGpxFiles)
+
+    # see if there is a temperature log
+    if not os.path.exists(environmentFile):
+        print('No ENVLOG.TXT found.')
+    else:
+        print('ENVLOG.TXT found.')
+
+    # parse the environment log once into a temperature timeline
+    envLog = readEnvironmentLog(environmentFile)
+
+    print('---------------------------------------')
+
+    # if no BMP found, there is nothing to do
+    if bmpNumber==0:
+        closeReport(csvReport)
+        print('Sorry, nothing to do here. Bye now.')
+        sys.exit()
+
+    print('Converting / georeferencing ' + str(bmpNumber) + ' detector files. Please hang on...')
+    print('---------------------------------------')
+
+    processedFiles = 0
+    referenced = list()
+    convertFiles = list()
+    jpgTags = list()
+    validBmpFiles.sort()
+
+    # georeference all screenshots in a single call, using their original file time stamps converted to UTC
+    bmpDates = [modification_date(bmpFile) for bmpFile in validBmpFiles]
+    fixes = joinTrackpoints(trackIndex, [epochSeconds(d - datetime.timedelta(hours=utcTimeCorrection)) for d in bmpDates], \
+        gpsTolerance, gpsMode)
+
+    for index, bmpFile in enumerate(validBmpFiles):
+
+        # store original file name, date and time for later use in the csv outputs
+        d = bmpDates[index]
+        originalFile = os.path.basename(bmpFile)
+        originalFileDate = ("%04d-%02d-%02d" % (d.year, d.month, d.day))
+        originalFileTime = ("%02d:%02d" % (d.hour, d.minute))
+
+        # rename each BMP file to meaningfull date-time string.
+        # get the original file date for this (only possible on Linux hosts!)    
+        newFileName = ("%04d%02d%02d_%02d%02d%02d" % (d.year, d.month, d.day, d.hour, d.minute, d.second))
+        os.rename(bmpFile, baseDataPath + newFileName + ".bmp")
+
+        # collect the BMP screenshot for the jpg conversion and compose the EXIF metadata of the new picture
+        # both are done for all screenshots at once, see below
+        exifString = ("%04d%02d%02d%02d%02d%02d" % (d.year, d.month, d.day, d.hour, d.minute, d.second))        
+        convertFiles.append(baseDataPath + newFileName + ".bmp")
+        jpgTags.append((baseDataPath + newFileName + ".jpg", ["-alldates=" + exifString, "-copyright=" + exifCopyright, \
+            "-artist=" + exifArtist, "-make=" + detectorMake, "-model=" + detectorType]))
+
+
+        currentJpg = newFileName + ".jpg"
+
+         # make UTC timestamp
+        jpgYear=(currentJpg[0:4])
+        jpgMonth=(currentJpg[4:6])
+        jpgDay=(currentJpg[6:8])
+        jpgHour=(currentJpg[9:11])
+        jpgMinute=(currentJpg[11:13])
+        jpgSecond=(currentJpg[13:15])
+
+        jpgDateTime = datetime.datetime(int(jpgYear), int(jpgMonth), int(jpgDay), int(jpgHour), int(jpgMinute), int(jpgSecond))
+        jpgDateTime = jpgDateTime - datetime.timedelta(hours=utcTimeCorrection)
+
+        # get temperature from the environment log timeline (local screenshot time)
+        # if no valid temperature can be found, we create an empty temperature string
+        tempTemperature = findTemperature(envLog, jpgDateTime + datetime.timedelta(hours=utcTimeCorrection))
+        if tempTemperature is None:
+            theTemperature = ""
+        else:
+            theTemperature = str(round(tempTemperature))
+
+        # try to georeference the screenshot
+        lat = ""
+        long = ""
+        altitude = ""
+        hdop = ""
+
+        if fixes['found'][index]:
+            lat = '%.6f' % fixes['lat'][index]
+            long = '%.6f' % fixes['long'][index]
+            altitude = '%.6f' % fixes['altitude'][index]
+            hdop = '%.1f' % fixes['hdop'][index]
+
+            referenced.append([currentJpg,lat,long,altitude])
+            processedFiles=processedFiles+1
+
+        # output some feedback to the screen and the output file
+        outputString1 =  originalFileDate + ";" + originalFileTime + ";" + currentJpg + ";" + theTemperature + ";" + lat + ";" + long + ";" + altitude + ";" + hdop
+        print (outputString1)
+
+        # write to the csv
+        writeCsvRow(csvReport, [originalFileDate, originalFileTime, currentJpg, theTemperature, lat, long, altitude, hdop, \
+            detectorType, detectorFirmware, detectorFirmwareRev, detectorSerial, detectorAutoBat, detectorLevel])
+
+    closeReport(csvReport)
+    print('---------------------------------------')
+
+    # convert all BMP screenshots to jpg files (needs ImageMagick) and set their EXIF data (needs exiftool)
+    print('Converting ' + str(len(convertFiles)) + ' screenshots to jpg files...')
+    try:
+        if not convertBmpFiles(convertFiles, conversionJobs):
+            print('Error converting BMP files with mogrify.')
+        if not writeExifTags(jpgTags, conversionJobs):
+            print('Error writing EXIF data with exiftool.')
+    except OSError:
+        print('Sorry, can not run mogrify or exiftool. Please install the ImageMagick and exiftool packages.')
+        sys.exit()
+
+    print('---------------------------------------')
+
+    # now build a kml file from mulidimensional array with referenced files
+    if gpxNumber!=0:
+        currentKml = outputPath + 'detector-session.kml'
+
+        kmlReport = openKmlReport(currentKml, currentKml)
+        for geoPoint in referenced:
+            writeKmlPlacemark(kmlReport, geoPoint[0], str(jpgDateTime), geoPoint[1], geoPoint[2], geoPoint[3])
+        closeReport(kmlReport)
+        print("KML file: " + currentKml)
+
+    # clean up, BMP files are only deleted if they were converted, the others are kept for another run
+    keptFiles = 0
+    for bmpFile in glob.glob(baseDataPath + '*.bmp'):
+        if os.path.exists(bmpFile[:-4] + '.jpg'):
+            os.remove(bmpFile)
+        else:
+            keptFiles += 1
+    if keptFiles > 0:
+        print(str(keptFiles) + ' BMP files not converted, they are kept in ' + baseDataPath)
+
+    print('---------------------------------------')
+    print ("All done. " + str(processedFiles) + " files processed. Bye now.")
+
+#----------------------------------------------------------------------------------
+if __name__ == '__main__':
+    main(sys.argv[1:])
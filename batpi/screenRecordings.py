@@ -0,0 +1,271 @@
+#!/usr/lib/python3.2
+
+# General description:
+# Script for Raspberry Bat Pi v1 and v2. See http://www.bat-pi.eu for more information.
+# Screens the recordings of a Bat-Pi session for bat calls before they are georeferenced and imported into BatScope.
+# Many recordings are triggered by wind, rain or insects, they only cost time in BatScope and in the manual review.
+# The script serves a bat survey as part of a fauna, flora and habitat monitoring project
+# Organisation: BI Rettet den Wollenberg e.V. see http://bi-wollenberg.org/ (German site)
+# Author      : FVG - ffhmonitor@gmail.com
+
+# Script actions in detail:
+# - it reads the trigger frequency (start frequency) from the Bat Pi settings, see makeBatScopeXml.py
+# - it splits each recording in short blocks and computes their spectrum (FFT) from the memory mapped wav file
+# - blocks with energy above the trigger frequency well above the noise floor of the recording and with a clear
+#   peak frequency are loud blocks
+# - consecutive loud blocks are a call if they look like a bat call:
+#   an FM sweep (the peak frequency falls smoothly by at least 5 kHz within at most 30 msec) or
+#   a CF call of a horseshoe bat (a steady peak frequency for at least 10 msec)
+# - recordings without a call are likely noise
+# - it writes a report with the scores of all recordings into /reports/noise-screening.csv
+# - with --move, likely noise is moved into /out/data/noise/, so makeBatScopeXml.py and BatScope do not see it
+#   move them back into /out/data to undo it
+
+# Needs NumPy (https://numpy.org), recordings are processed by a pool of worker processes.
+# Usage: screenRecordings.py [--jobs N] [--min-frequency HZ] [--min-calls N] [--move] <base path>
+# This file is on GitHub: https://github.com/ffhmon/bat-project/batpi/screenRecordings.py
+# Licence: GNU General Public Licence v3
+
+# Script history:
+# Version 1.0 - October 17, 2026 - initial commit
+#   - reads the samples through mapWavSamples() of batPiCommon.py, any PCM or float wav file can be screened,
+#     samples are scaled to full scale, so the thresholds are the same for all sample formats
+
+#----------------------------------------------------------------------------------
+def findCalls(peakFrequency, loud, blockSeconds):
+
+    # counts the bat calls in runs of consecutive loud blocks, using the peak frequency of each block
+    # returns a (sweeps, cfCalls) tuple
+    sweeps = 0
+    cfCalls = 0
+    edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(([0], loud.astype(numpy.int8), [0]))))
+    for first, last in zip(edges[0::2], edges[1::2]):
+        duration = (last - first) * blockSeconds
+        if last - first < 2:
+            continue    # clicks of rain drops are a single block
+        run = peakFrequency[first:last]
+        steps = numpy.diff(run)
+        if duration <= sweepMaxSeconds and run[0] - run[-1] >= sweepMinHz and (steps <= 0).mean() >= sweepFallingShare \
+                and numpy.abs(steps).max() <= sweepMaxStepHz:
+            sweeps += 1
+        elif duration >= cfMinSeconds and run.max() - run.min() <= cfMaxSpreadHz:
+            cfCalls += 1
+    return sweeps, cfCalls
+
+#----------------------------------------------------------------------------------
+def screenRecording(task):
+
+    # computes the scores of one recording, runs in a worker process
+    # returns a dict with the scores, status is 'bat', 'noise' or 'unreadable'
+    wavFile, minFrequency, minCalls = task
+    result = dict(wavFile=os.path.basename(wavFile), status='unreadable', highShare='', loudBlocks=0, sweeps=0, cfCalls=0)
+
+    wavMap = mapWavSamples(wavFile)
+    if wavMap is None or wavMap['frames'] < screenBlockSize:
+        return result
+
+    blocks = wavMap['frames'] // screenBlockSize
+    window = numpy.hanning(screenBlockSize).astype(numpy.float32)
+    frequencies = numpy.fft.rfftfreq(screenBlockSize, 1.0 / wavMap['sampleRate'])
+    high = frequencies >= minFrequency
+    highFrequencies = frequencies[high]
+
+    totalEnergy = numpy.empty(blocks)
+    highEnergy = numpy.empty(blocks)
+    peakFrequency = numpy.zeros(blocks)
+    tonality = numpy.zeros(blocks)
+
+    # only the first channel is screened, in chunks of screenChunkBlocks blocks, an incomplete last block is left out
+    try:
+        for firstFrame, chunkSamples in iterWavChunks(wavMap, screenChunkBlocks * screenBlockSize):
+            first = firstFrame // screenBlockSize
+            last = min(first + screenChunkBlocks, blocks)
+            if last <= first:
+                break
+            chunk = chunkSamples[0:(last - first) * screenBlockSize, 0].astype(numpy.float32).reshape(-1, screenBlockSize)
+            chunk = (chunk - wavMap['sampleOffset']) / wavMap['fullScale']
+            power = numpy.abs(numpy.fft.rfft(chunk * window, axis=1)) ** 2
+            totalEnergy[first:last] = power.sum(axis=1)
+            highPower = power[:, high]
+            highEnergy[first:last] = highPower.sum(axis=1)
+            if highFrequencies.size > 0:
+                peakFrequency[first:last] = highFrequencies[highPower.argmax(axis=1)]
+                tonality[first:last] = highPower.max(axis=1) / numpy.maximum(highPower.mean(axis=1), minNoiseFloor)
+    finally:
+        del wavMap['samples']
+
+    # loud blocks stand out of the noise floor (the median block) above the trigger frequency
+    # and have a clear peak frequency - clicks of rain drops and insect buzz are spread over all frequencies
+    loud = highEnergy > max(numpy.median(highEnergy), minNoiseFloor) * 10 ** (loudThresholdDb / 10.0)
+    loud &= tonality >= minTonality
+    sweeps, cfCalls = findCalls(peakFrequency, loud, float(screenBlockSize) / wavMap['sampleRate'])
+
+    result['highShare'] = '%.3f' % (highEnergy.sum() / max(totalEnergy.sum(), minNoiseFloor))
+    result['loudBlocks'] = int(loud.sum())
+    result['sweeps'] = sweeps
+    result['cfCalls'] = cfCalls
+    result['status'] = 'bat' if sweeps + cfCalls >= minCalls else 'noise'
+    return result
+
+# ==================================================================================================================
+# Main program
+# ==================================================================================================================
+
+import getopt, multiprocessing, os, sys
+from .batPiCommon import scanWavFiles, isValidRecording, mapWavSamples, iterWavChunks, readBatPiSettings, loadNumpy, \
+    openCsvReport, writeCsvRow, closeReport
+
+# numpy, set by main() before the workers start
+numpy = None
+
+# start frequency if the Bat Pi settings can not be read
+defaultMinFrequency = 15000
+
+# samples per FFT block, 256 samples are 0.67 msec and 1.5 kHz per frequency bin at 384 kHz
+screenBlockSize = 256
+
+# blocks transformed at once, memory use stays small for long recordings
+screenChunkBlocks = 1024
+
+# samples are scaled to full scale (-1 to 1) for every sample format, the noise floor is at least the
+# energy of one step of a 16 bit recording, so a silent recording has no loud blocks
+minNoiseFloor = 1.0 / 32768 ** 2
+
+# a block is loud if its energy above the trigger frequency is this much above the noise floor of the recording
+loudThresholdDb = 12
+
+# a block has a clear peak frequency if the peak is this many times the mean energy above the trigger frequency
+minTonality = 10
+
+# an FM sweep falls by at least sweepMinHz within sweepMaxSeconds, most steps between blocks falling or flat
+sweepMinHz = 5000
+sweepMaxSeconds = 0.03
+sweepFallingShare = 0.6
+sweepMaxStepHz = 15000
+
+# a CF call keeps its peak frequency within cfMaxSpreadHz for at least cfMinSeconds
+cfMinSeconds = 0.01
+cfMaxSpreadHz = 3000
+
+def main(argv):
+
+    # runs the script with the command line arguments argv (without the script name)
+    global numpy
+
+    # default variables - can be changed by sys.argv ###
+
+    # default base path - user's working directory
+    basePath = os.getcwd() + '/'
+
+    # number of worker processes
+    jobs = multiprocessing.cpu_count()
+
+    # calls are searched above this frequency, default is the start frequency of the Bat Pi settings
+    minFrequency = 0
+
+    # recordings with fewer calls are likely noise
+    minCalls = 1
+
+    # move likely noise into out/data/noise instead of only listing it in the report
+    moveNoise = False
+
+    ### parse command line args
+    try:
+        options, arguments = getopt.gnu_getopt(argv, 'j:', ['jobs=', 'min-frequency=', 'min-calls=', 'move'])
+        for option, value in options:
+            if option in ('-j', '--jobs'):
+                jobs = int(value)
+                if jobs < 1:
+                    raise ValueError('Number of jobs must be at least 1.')
+            if option == '--min-frequency':
+                minFrequency = int(value)
+                if minFrequency < 1:
+                    raise ValueError('Minimum frequency must be at least 1 Hz.')
+            if option == '--min-calls':
+                minCalls = int(value)
+                if minCalls < 1:
+                    raise ValueError('Minimum number of calls must be at least 1.')
+            if option == '--move':
+                moveNoise = True
+
+        if len(arguments) > 1:
+            raise ValueError('Too many arguments.')
+        if len(arguments) == 1:
+            candidatePath = arguments[0]
+            if not os.path.exists(candidatePath) and os.path.exists(basePath + candidatePath):
+                candidatePath = basePath + candidatePath
+            basePath = os.path.abspath(candidatePath) + '/'
+    except:
+        print("Invalid command argument. Usage: screenRecordings.py [--jobs N] [--min-frequency HZ] [--min-calls N] [--move] <base path>")
+        sys.exit(1)
+
+    numpy = loadNumpy()
+    if numpy is None:
+        print('Sorry, screening recordings needs NumPy. Please install it, e.g. with: pip3 install numpy')
+        sys.exit(1)
+
+    piRawDataPath = basePath + 'out/data/'
+    noisePath = piRawDataPath + 'noise/'
+    reportsPath = basePath + 'reports/'
+    if not os.path.exists(piRawDataPath):
+        print('Sorry, can not find the Bat-Pi raw data input directory:')
+        print(piRawDataPath)
+        sys.exit(1)
+
+    if minFrequency == 0:
+        try:
+            minFrequency = int(readBatPiSettings(basePath)[1].startFrequency)
+        except:
+            minFrequency = defaultMinFrequency
+            print('Can not read the start frequency from the Bat Pi settings.')
+
+    print ("Using base path: " + basePath)
+    print ("Using jobs: " + str(jobs))
+    print ("Searching calls above: " + str(minFrequency) + " Hz")
+    print('----------------------------------------------------------------')
+
+    wavFiles = [wavEntry['path'] for wavEntry in scanWavFiles(piRawDataPath) if isValidRecording(wavEntry)]
+    print (str(len(wavFiles)) + ' valid wav files.')
+    if len(wavFiles) == 0:
+        print('Sorry, no recordings found. Nothing to do here. Bye now.')
+        sys.exit(2)
+
+    tasks = [(wavFile, minFrequency, minCalls) for wavFile in wavFiles]
+    if jobs > 1:
+        # workers inherit numpy and the settings from this process
+        pool = multiprocessing.get_context('fork').Pool(jobs)
+        try:
+            results = pool.map(screenRecording, tasks, 8)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = list(map(screenRecording, tasks))
+
+    if not os.path.exists(reportsPath):
+        os.makedirs(reportsPath)
+    report = openCsvReport(reportsPath + 'noise-screening.csv', ['WavFile', 'Status', 'HighShare', 'LoudBlocks', 'Sweeps', 'CFCalls'])
+    counts = dict(bat=0, noise=0, unreadable=0)
+    for result in results:
+        writeCsvRow(report, [result['wavFile'], result['status'], result['highShare'], result['loudBlocks'], result['sweeps'], result['cfCalls']])
+        counts[result['status']] += 1
+    closeReport(report)
+
+    if moveNoise and counts['noise'] > 0:
+        if not os.path.exists(noisePath):
+            os.makedirs(noisePath)
+        for result in results:
+            if result['status'] == 'noise':
+                os.rename(piRawDataPath + result['wavFile'], noisePath + result['wavFile'])
+                print(result['wavFile'] + ' --> moved to noise path')
+
+    # inform user
+    print('----------------------------------------------------------------')
+    print(str(counts['bat']) + ' recordings with bat calls, ' + str(counts['noise']) + ' likely noise, ' + \
+        str(counts['unreadable']) + ' not readable.')
+    print('Report: ' + reportsPath + 'noise-screening.csv')
+    print('All done. Bye now.')
+
+#----------------------------------------------------------------------------------
+if __name__ == '__main__':
+    main(sys.argv[1:])
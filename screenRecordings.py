@@ -0,0 +1,14 @@
+#!/usr/lib/python3.2
+
+# screenRecordings.py - screens Bat-Pi recordings for bat calls and sorts out likely noise
+# The code is in the batpi package next to this script, see batpi/screenRecordings.py for a detailed description.
+# It can also be run as a subcommand of the batpi command line: python3 -m batpi screen [options]
+
+# This file is on GitHub: https://github.com/ffhmon/bat-project/screenRecordings.py
+# Licence: GNU General Public Licence v3
+
+import sys
+from batpi.screenRecordings import main
+
+if __name__ == '__main__':
+    main(sys.argv[1:])